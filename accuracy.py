@@ -1,8 +1,5 @@
-import pandas as pd
-from sklearn.metrics import accuracy_score, classification_report, confusion_matrix
-
-# Load the CSV
-df = pd.read_csv("/Users/balajia/Desktop/Preludesys/medical_doc_processor/output/Sample_Data.csv")
+import argparse
+from config import OUTPUT_CSV
 
 # Your existing category mapping
 category_map = {
@@ -38,14 +35,28 @@ def map_header_to_category(header):
             return category_map[key]
     return -1  # Unmapped or unknown
 
-# Apply the mapping
-df['predicted_category'] = df['header'].fillna("").apply(map_header_to_category)
+def evaluate(csv_path):
+    """Print accuracy, classification report and confusion matrix for a CSV"""
+    import pandas as pd
+    from sklearn.metrics import accuracy_score, classification_report, confusion_matrix
+
+    # Load the CSV
+    df = pd.read_csv(csv_path)
+
+    # Apply the mapping
+    df['predicted_category'] = df['header'].fillna("").apply(map_header_to_category)
+
+    # Ground truth and prediction
+    y_true = df['category']
+    y_pred = df['predicted_category']
 
-# Ground truth and prediction
-y_true = df['category']
-y_pred = df['predicted_category']
+    # Evaluation metrics
+    print("Accuracy:", accuracy_score(y_true, y_pred))
+    print("\nClassification Report:\n", classification_report(y_true, y_pred))
+    print("\nConfusion Matrix:\n", confusion_matrix(y_true, y_pred))
 
-# Evaluation metrics
-print("Accuracy:", accuracy_score(y_true, y_pred))
-print("\nClassification Report:\n", classification_report(y_true, y_pred))
-print("\nConfusion Matrix:\n", confusion_matrix(y_true, y_pred))
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Score the header categories of a generated CSV")
+    parser.add_argument("csv", nargs="?", default=OUTPUT_CSV, help=f"CSV to evaluate (default: {OUTPUT_CSV})")
+    args = parser.parse_args()
+    evaluate(args.csv)
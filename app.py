@@ -2,17 +2,22 @@ import streamlit as st
 import os
 import pandas as pd
 from datetime import datetime
-from tempfile import NamedTemporaryFile
 import re
 import numpy as np
 import json
-from preprocessing.pdf_detector import is_scanned
-from preprocessing.digital_pdf import extract_digital_pages
-from preprocessing.scanned_pdf import extract_scanned_pages
-from clustering.embeddings import get_embeddings
-from clustering.clustering import cluster_pages
-from main import generate_output, extract_entities, postprocess_clusters, load_header_patterns, save_header_patterns
-from config import OUTPUT_CSV, CSV_HEADER
+import hashlib
+import threading
+from collections import OrderedDict
+from preprocessing.hybrid_pdf import extract_pages
+from clustering.embeddings import get_embeddings, get_model, warm_up
+from main import generate_output, assign_labels
+from extraction.entities import analyze_page, page_dos, page_text
+from extraction.headers import HeaderMatcher, get_header_matcher, save_header_patterns
+from instrumentation import Tracer
+from config import CSV_HEADER
+
+# Processed uploads kept for instant reruns (tab switches, downloads)
+MAX_CACHED_DOCUMENTS = 8
 
 # Configure Streamlit page
 st.set_page_config(
@@ -143,7 +148,7 @@ def calculate_metrics(pages, labels):
     previous_header = None
     
     for page in sorted(pages, key=lambda x: x['metadata']['page_num']):
-        _, _, headers, _ = extract_entities(page["text"])
+        headers = analyze_page(page_text(page)).headers
         current_header = headers[0] if headers else "Unknown"
         
         if current_header == previous_header or previous_header is None:
@@ -176,8 +181,9 @@ def calculate_metrics(pages, labels):
     }
 
     for page in pages:
-        dos, provider, _, patient_info = extract_entities(page["text"])
-        if dos != datetime.now().strftime("%m/%d/%Y"):
+        analysis = analyze_page(page_text(page))
+        provider, patient_info = analysis.provider, analysis.patient_info
+        if page_dos(analysis) != datetime.now().strftime("%m/%d/%Y"):
             metrics['extraction_metrics']['dos_extracted'] += 1
         if provider != "Unknown Provider":
             metrics['extraction_metrics']['provider_found'] += 1
@@ -189,9 +195,9 @@ def calculate_metrics(pages, labels):
             continue
                 
         metrics['cluster_consistency']['total_comparable_clusters'] += 1
-        entities = [extract_entities(p["text"]) for p in cluster]
+        entities = [analyze_page(page_text(p)) for p in cluster]
         
-        dos_formats = [e[0] for e in entities]
+        dos_formats = [page_dos(e) for e in entities]
         providers = [e[1] for e in entities]
         
         if len(set(dos_formats)) == 1:
@@ -243,7 +249,7 @@ def display_sample_clusters(pages, labels):
     previous_header = None
     
     for page in sorted(pages, key=lambda x: x['metadata']['page_num']):
-        _, _, headers, _ = extract_entities(page["text"])
+        headers = analyze_page(page_text(page)).headers
         current_header = headers[0] if headers else "Unknown"
         
         if current_header == previous_header or previous_header is None:
@@ -273,13 +279,14 @@ def display_sample_clusters(pages, labels):
             tab1, tab2 = st.tabs(["Summary", "Details"])
             
             with tab1:
-                dos, provider, header, _ = extract_entities(cluster[0]["text"])
+                analysis = analyze_page(page_text(cluster[0]))
+                dos, provider, header = page_dos(analysis), analysis.provider, analysis.headers
                 st.write(f"**Header:** {header}")
                 st.write(f"**Provider:** {provider}")
                 st.write(f"**Date of Service:** {dos}")
                 
-                entities = [extract_entities(p["text"]) for p in cluster]
-                dos_consistent = len(set(e[0] for e in entities)) == 1
+                entities = [analyze_page(page_text(p)) for p in cluster]
+                dos_consistent = len(set(page_dos(e) for e in entities)) == 1
                 provider_consistent = len(set(e[1] for e in entities)) == 1
                 
                 col1, col2 = st.columns(2)
@@ -289,44 +296,144 @@ def display_sample_clusters(pages, labels):
             with tab2:
                 for j, page in enumerate(cluster[:3]):
                     st.write(f"**Page {page['metadata']['page_num']}** (Text snippet):")
-                    st.text(page["text"][:200] + "...")
+                    st.text(page_text(page)[:200] + "...")
                     st.divider()
         
         displayed += 1
 
-def process_document(file_path):
-    """Process the document and return pages, embeddings, and labels"""
+class ProgressTracer(Tracer):
+    """Tracer that also drives the Streamlit progress bar and status line"""
+
+    # (status message, share of the progress bar) per stage
+    STAGES = {
+        "extraction": ("📄 Extracting pages...", 10),
+        "ocr_bands": ("🔎 Running OCR on header/footer bands...", 10),
+        "ocr": ("🔎 Running OCR on scanned pages...", 30),
+        "duplicates": ("🗂️ Finding duplicate pages...", 0),
+        "embedding": ("🧠 Generating embeddings...", 35),
+        "clustering": ("🔢 Clustering pages...", 10),
+        "segmentation": ("🔢 Segmenting pages...", 15),
+        "postprocessing": ("🧹 Merging clusters...", 5),
+        "output": ("💾 Generating output...", 10),
+    }
+
+    def __init__(self, document, progress_bar, status_text):
+        super().__init__(document)
+        self.progress_bar = progress_bar
+        self.status_text = status_text
+        self.done = 0
+        self.bands_share = 0
+        self.ocr_share = 0
+        self.ocr_total = 0
+        self.ocr_done = 0
+
+    def share(self, name):
+        """Progress bar share of a stage; bands mode's band OCR takes part of the full OCR's share"""
+        share = self.STAGES.get(name, ("", 0))[1]
+        return share - self.bands_share if name == "ocr" else share
+
+    def stage(self, name, pages=None):
+        message, _ = self.STAGES.get(name, (f"{name}...", 0))
+        self.status_text.markdown(f"<div class='processing-spinner'>{message}</div>", unsafe_allow_html=True)
+        if name in ("ocr", "ocr_bands"):
+            self.ocr_share, self.ocr_total, self.ocr_done = self.share(name), pages or 0, 0
+        return super().stage(name, pages)
+
+    def end_stage(self, record):
+        super().end_stage(record)
+        self.done += self.share(record["stage"])
+        if record["stage"] == "ocr_bands":
+            self.bands_share = self.STAGES["ocr_bands"][1]
+        self.progress_bar.progress(min(self.done, 100))
+
+    def page(self, stage, page_num, seconds):
+        super().page(stage, page_num, seconds)
+        if stage in ("ocr", "ocr_bands") and self.ocr_total:
+            self.ocr_done += 1
+            share = self.ocr_share * self.ocr_done // self.ocr_total
+            self.progress_bar.progress(min(self.done + share, 100))
+
+@st.cache_resource(show_spinner="🧠 Loading embedding model...")
+def load_embedding_model():
+    """Embedding model shared by every session and rerun"""
+    warm_up()
+    return get_model()
+
+@st.cache_resource
+def processed_documents():
+    """Pipeline results keyed by (upload hash, header patterns), shared across reruns and sessions
+
+    Returned with the lock that guards them, since sessions run on separate threads.
+    """
+    return OrderedDict(), threading.Lock()
+
+def process_document(data):
+    """Process the PDF bytes and return pages, labels, output rows, and the stage timings"""
     progress_bar = st.progress(0)
     status_text = st.empty()
+    tracer = ProgressTracer("upload", progress_bar, status_text)
     
-    status_text.markdown("<div class='processing-spinner'>🔍 Detecting document type...</div>", unsafe_allow_html=True)
-    scanned = is_scanned(file_path)
-    progress_bar.progress(10)
-    
-    status_text.markdown("<div class='processing-spinner'>📄 Extracting pages...</div>", unsafe_allow_html=True)
-    pages = extract_scanned_pages(file_path) if scanned else extract_digital_pages(file_path)
-    progress_bar.progress(30)
+    pages = extract_pages(data, tracer=tracer)
+    if not any(s["stage"] in ("ocr", "ocr_bands") for s in tracer.stages):
+        tracer.done += tracer.share("ocr")
     
-    status_text.markdown("<div class='processing-spinner'>🧠 Generating embeddings...</div>", unsafe_allow_html=True)
-    embeddings = get_embeddings(pages)
-    progress_bar.progress(60)
+    with tracer.stage("embedding", pages=len(pages)):
+        embeddings = get_embeddings(pages)
     
-    status_text.markdown("<div class='processing-spinner'>🔢 Clustering pages...</div>", unsafe_allow_html=True)
-    labels = cluster_pages(embeddings)
-    labels = postprocess_clusters(pages, labels)
-    progress_bar.progress(80)
+    labels = assign_labels(pages, embeddings, tracer=tracer)
     
-    status_text.markdown("<div class='processing-spinner'>💾 Generating output...</div>", unsafe_allow_html=True)
-    generate_output(pages, labels)
+    with tracer.stage("output", pages=len(pages)):
+        rows = generate_output(pages, labels, output_path=None)
     progress_bar.progress(100)
+    status_text.empty()
+    progress_bar.empty()
     
-    return pages, labels
+    return pages, labels, rows, tracer.to_dict()
+
+def get_processed_document(data):
+    """Cached process_document result for these bytes under the current header patterns"""
+    patterns = tuple(tuple(p) for p in get_header_matcher().patterns)
+    key = (hashlib.sha256(data).hexdigest(), hash(patterns))
+    documents, lock = processed_documents()
+    with lock:
+        if key in documents:
+            documents.move_to_end(key)
+            return documents[key]
+    pages, labels, rows, trace = process_document(data)
+    result = {
+        "pages": pages,
+        "labels": labels,
+        "rows": rows,
+        "trace": trace,
+        "metrics": calculate_metrics(pages, labels)
+    }
+    with lock:
+        documents[key] = result
+        while len(documents) > MAX_CACHED_DOCUMENTS:
+            documents.popitem(last=False)
+    return result
+
+def display_timings(trace):
+    """Per-stage timing table and the JSON trace download"""
+    st.dataframe(pd.DataFrame([{
+        'Stage': stage['stage'],
+        'Pages': stage['pages'],
+        'Wall (s)': stage['wall_seconds'],
+        'CPU (s)': stage['cpu_seconds'],
+        'Peak RSS so far (MB)': round(stage['peak_rss_mb'], 1) if stage['peak_rss_mb'] is not None else None,
+    } for stage in trace['stages']]), use_container_width=True)
+    st.download_button(
+        label="📥 Download Trace (JSON)",
+        data=json.dumps(trace, indent=2),
+        file_name="trace.json",
+        mime="application/json"
+    )
 
 def manage_header_patterns():
     """Streamlit interface for managing header patterns"""
     st.subheader("➕ Manage Custom Header Patterns")
     
-    patterns = load_header_patterns()
+    patterns = [list(p) for p in get_header_matcher().patterns]
     
     with st.expander("📋 View Current Header Patterns"):
         if patterns:
@@ -347,7 +454,7 @@ def manage_header_patterns():
     if st.button("Add Pattern"):
         if new_regex and new_header:
             try:
-                re.compile(new_regex)
+                HeaderMatcher.validate(new_regex)
                 patterns.append((new_regex, new_header))
                 save_header_patterns(patterns)
                 st.success("✅ Pattern added successfully!")
@@ -411,22 +518,14 @@ def main():
         
         if uploaded_file:
             try:
-                with NamedTemporaryFile(delete=False, suffix=".pdf") as tmp_file:
-                    tmp_file.write(uploaded_file.read())
-                    tmp_file_path = tmp_file.name
-
+                load_embedding_model()
                 with st.spinner("Processing document..."):
-                    pages, labels = process_document(tmp_file_path)
-                    metrics = calculate_metrics(pages, labels)
-                    
-                    try:
-                        os.unlink(tmp_file_path)
-                    except:
-                        pass
+                    result = get_processed_document(uploaded_file.getvalue())
+                pages, labels, metrics = result["pages"], result["labels"], result["metrics"]
 
                 st.success("✅ Processing complete!")
                 
-                subtab1, subtab2, subtab3 = st.tabs(["📊 Metrics", "🔍 Sample Clusters", "📋 Full Output"])
+                subtab1, subtab2, subtab3, subtab4 = st.tabs(["📊 Metrics", "🔍 Sample Clusters", "📋 Full Output", "⏱️ Timings"])
                 
                 with subtab1:
                     display_metrics(metrics)
@@ -435,27 +534,22 @@ def main():
                     display_sample_clusters(pages, labels)
                     
                 with subtab3:
-                    try:
-                        df = pd.read_csv(OUTPUT_CSV)
-                        st.dataframe(df, use_container_width=True)
-                        
-                        with open(OUTPUT_CSV, 'rb') as f:
-                            st.download_button(
-                                label="📥 Download Full Results",
-                                data=f,
-                                file_name="medical_document_processing.csv",
-                                mime='text/csv'
-                            )
-                    except Exception as e:
-                        st.error(f"Error loading output file: {str(e)}")
+                    df = pd.DataFrame(result["rows"], columns=CSV_HEADER)
+                    st.dataframe(df, use_container_width=True)
+                    
+                    st.download_button(
+                        label="📥 Download Full Results",
+                        data=df.to_csv(index=False),
+                        file_name="medical_document_processing.csv",
+                        mime='text/csv'
+                    )
+                
+                with subtab4:
+                    display_timings(result["trace"])
 
             except Exception as e:
                 st.error(f"An error occurred during processing: {str(e)}")
                 st.error("Please check the document format and try again.")
-                try:
-                    os.unlink(tmp_file_path)
-                except:
-                    pass
     
     with tab2:
         manage_header_patterns()
@@ -0,0 +1,186 @@
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import multiprocessing
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from config import SEGMENTATION_METHOD
+from preprocessing.hybrid_pdf import extract_pages
+from clustering.embeddings import get_embeddings, warm_up
+from main import assign_labels, generate_output
+from output_writers import WRITERS
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_FILE = "batch_summary.json"
+
+
+def find_pdfs(inputs, file_list=None):
+    """PDF paths from files, directories (top level) and an optional list file"""
+    paths = []
+    for item in inputs:
+        if os.path.isdir(item):
+            paths.extend(
+                os.path.join(item, name) for name in sorted(os.listdir(item))
+                if name.lower().endswith(".pdf")
+            )
+        else:
+            paths.append(item)
+    if file_list:
+        with open(file_list, 'r') as f:
+            paths.extend(line.strip() for line in f if line.strip())
+    return list(dict.fromkeys(paths))
+
+
+def input_root(pdf_paths):
+    """Deepest directory containing every input PDF"""
+    return os.path.commonpath([os.path.dirname(os.path.abspath(path)) for path in pdf_paths])
+
+
+def output_path_for(pdf_path, output_dir, output_format="csv", root=None):
+    """Output file for pdf_path, mirroring its path below root (default: its directory) under output_dir"""
+    relative = os.path.relpath(os.path.abspath(pdf_path), root) if root else os.path.basename(pdf_path)
+    return os.path.join(output_dir, os.path.splitext(relative)[0] + "." + output_format)
+
+
+def _extract(pdf_path, ocr_workers):
+    """Worker: extract one PDF's pages (text layer + OCR)"""
+    start = time.perf_counter()
+    pages = extract_pages(pdf_path, workers=ocr_workers)
+    return pages, time.perf_counter() - start
+
+
+def _finish(pdf_path, pages, output_path, method, output_format="csv"):
+    """Embed, group and write one document in the parent process (shared model)"""
+    timings = {}
+    start = time.perf_counter()
+    embeddings = get_embeddings(pages)
+    timings["embed"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    labels = assign_labels(pages, embeddings, method)
+    timings["cluster"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    tmp_path = output_path + ".tmp"
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    try:
+        generate_output(pages, labels, tmp_path, output_format, return_rows=False)
+        os.replace(tmp_path, output_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    timings["output"] = time.perf_counter() - start
+    return timings
+
+
+def run_batch(pdf_paths, output_dir, workers=1, ocr_workers=1, resume=False, method=SEGMENTATION_METHOD,
+              output_format="csv"):
+    """Process many PDFs: extraction on a process pool, embedding with one model
+
+    Returns one result dict per input PDF (status "ok", "skipped" or "failed").
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    # Same-named PDFs in different subdirectories get separate outputs
+    root = input_root(pdf_paths) if pdf_paths else None
+    output_paths = [output_path_for(pdf_path, output_dir, output_format, root) for pdf_path in pdf_paths]
+    clashes = sorted(path for path, count in Counter(output_paths).items() if count > 1)
+    if clashes:
+        raise ValueError(f"Several input PDFs map to the same output file: {', '.join(clashes)}")
+    results = []
+    todo = []
+    for pdf_path, output_path in zip(pdf_paths, output_paths):
+        if resume and os.path.exists(output_path):
+            results.append({"file": pdf_path, "output": output_path, "status": "skipped"})
+        else:
+            todo.append((pdf_path, output_path))
+
+    if todo:
+        warm_up()
+
+    # Keep a bounded number of extracted documents waiting for the embedding step
+    max_in_flight = max(1, workers * 2)
+    # Spawned (not forked) workers: the parent holds a loaded torch model
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=max(1, workers), mp_context=context) as executor:
+        pending = {}
+        queue = list(todo)
+        while queue or pending:
+            while queue and len(pending) < max_in_flight:
+                pdf_path, output_path = queue.pop(0)
+                pending[executor.submit(_extract, pdf_path, ocr_workers)] = (pdf_path, output_path)
+
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                pdf_path, output_path = pending.pop(future)
+                result = {"file": pdf_path, "output": output_path}
+                try:
+                    pages, extract_seconds = future.result()
+                    timings = _finish(pdf_path, pages, output_path, method, output_format)
+                    timings["extract"] = extract_seconds
+                    result.update(
+                        status="ok",
+                        pages=len(pages),
+                        seconds={name: round(value, 3) for name, value in timings.items()}
+                    )
+                    logger.info("%s: %d pages in %.1fs", pdf_path, len(pages), sum(timings.values()))
+                except Exception as e:
+                    result.update(status="failed", error=f"{type(e).__name__}: {e}")
+                    logger.error("%s: failed (%s)", pdf_path, result["error"])
+                results.append(result)
+
+    order = {path: i for i, path in enumerate(pdf_paths)}
+    results.sort(key=lambda r: order[r["file"]])
+    return results
+
+
+def print_summary(results):
+    print(f"{'file':<40} {'status':<8} {'pages':>6} {'extract':>8} {'embed':>8} {'cluster':>8} {'output':>8}")
+    for r in results:
+        s = r.get("seconds", {})
+        print(
+            f"{os.path.basename(r['file'])[:40]:<40} {r['status']:<8} {r.get('pages', ''):>6} "
+            + " ".join(f"{s[k]:>8.2f}" if k in s else f"{'':>8}" for k in ("extract", "embed", "cluster", "output"))
+        )
+    failed = [r for r in results if r["status"] == "failed"]
+    counts = {status: sum(r["status"] == status for r in results) for status in ("ok", "skipped", "failed")}
+    print(f"\n{counts['ok']} processed, {counts['skipped']} skipped, {counts['failed']} failed")
+    for r in failed:
+        print(f"  {r['file']}: {r['error']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Process a directory or list of PDFs, one output file per PDF")
+    parser.add_argument("inputs", nargs="*", help="PDF files and/or directories containing PDFs")
+    parser.add_argument("--file-list", help="Text file with one PDF path per line")
+    parser.add_argument("--output-dir", required=True, help="Directory for the outputs (input subdirectories mirrored) and the summary")
+    parser.add_argument("--format", choices=sorted(WRITERS), default="csv", help="Output format (default: csv)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Extraction processes")
+    parser.add_argument("--ocr-workers", type=int, default=1, help="OCR processes per document")
+    parser.add_argument("--resume", action="store_true", help="Skip PDFs whose output file already exists")
+    parser.add_argument("--segmentation", choices=["dbscan", "sequential"], default=SEGMENTATION_METHOD)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    pdf_paths = find_pdfs(args.inputs, args.file_list)
+    if not pdf_paths:
+        parser.error("no PDFs given")
+
+    start = time.perf_counter()
+    try:
+        results = run_batch(pdf_paths, args.output_dir, args.workers, args.ocr_workers, args.resume,
+                            args.segmentation, args.format)
+    except ValueError as e:
+        parser.error(str(e))
+    elapsed = time.perf_counter() - start
+
+    with open(os.path.join(args.output_dir, SUMMARY_FILE), 'w') as f:
+        json.dump({"elapsed_seconds": round(elapsed, 3), "files": results}, f, indent=2)
+    print_summary(results)
+    print(f"Total {elapsed:.1f}s; summary written to {os.path.join(args.output_dir, SUMMARY_FILE)}")
+    sys.exit(1 if any(r["status"] == "failed" for r in results) else 0)
@@ -0,0 +1,83 @@
+"""Regression benchmark: generate_output must scale linearly with page count
+
+Run from the repository root:
+
+    python -m benchmarks.bench_generate_output
+    python -m benchmarks.bench_generate_output --sizes 1000 10000 50000 --tolerance 2.5
+
+Exits with status 1 when the per-page cost at the largest size exceeds the
+per-page cost at the smallest size by more than the tolerance factor.
+"""
+import os
+import time
+import random
+import argparse
+import tempfile
+from main import generate_output
+
+HEADERS = ["PROGRESS NOTES", "LABORATORY REPORT", "DISCHARGE SUMMARY", "VITAL SIGNS", "CONSENT FOR SURGERY"]
+
+
+def synthetic_document(num_pages, seed=0):
+    """Pages and labels shaped like a clustered chart: runs of 1-12 pages per cluster"""
+    rng = random.Random(seed)
+    pages = []
+    labels = []
+    label = 0
+    while len(pages) < num_pages:
+        header = rng.choice(HEADERS)
+        for _ in range(rng.randint(1, 12)):
+            page_num = len(pages) + 1
+            if page_num > num_pages:
+                break
+            pages.append({
+                "text": f"{header}\nABC Name MRN: {1000 + label} DOB: 1/1/1970 Legal Sex: F\n"
+                        f"Electronically signed by Jane Doe on {rng.randint(1, 12)}/{rng.randint(1, 28)}/2019\n"
+                        f"Page {page_num}",
+                "metadata": {"page_num": page_num}
+            })
+            labels.append(label)
+        label += 1
+    # Cluster ids are not in page order after DBSCAN
+    order = list(range(label))
+    rng.shuffle(order)
+    return pages, [order[l] for l in labels]
+
+
+def time_generate_output(num_pages, output_dir, repeats=3):
+    pages, labels = synthetic_document(num_pages)
+    output_path = os.path.join(output_dir, f"bench_{num_pages}.csv")
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        generate_output(pages, labels, output_path)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 5000, 10000, 25000, 50000])
+    parser.add_argument("--tolerance", type=float, default=2.5,
+                        help="Allowed growth of per-page time from the smallest to the largest size")
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    sizes = sorted(args.sizes)
+    results = []
+    with tempfile.TemporaryDirectory() as output_dir:
+        for size in sizes:
+            seconds = time_generate_output(size, output_dir, args.repeats)
+            results.append((size, seconds))
+            print(f"{size:>8} pages  {seconds:8.3f} s  {seconds / size * 1e6:8.1f} us/page")
+
+    growth = (results[-1][1] / results[-1][0]) / (results[0][1] / results[0][0])
+    print(f"Per-page cost growth {sizes[0]} -> {sizes[-1]}: {growth:.2f}x (tolerance {args.tolerance:.2f}x)")
+    if growth > args.tolerance:
+        print("FAIL: generate_output is no longer linear in page count")
+        raise SystemExit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
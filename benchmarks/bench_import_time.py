@@ -0,0 +1,63 @@
+"""Import-time benchmark for the CLI entry points
+
+Run from the repository root:
+
+    python -m benchmarks.bench_import_time
+    python -m benchmarks.bench_import_time --max-seconds 1.0
+
+Each command runs in a fresh interpreter; the best of --repeats wall times is
+reported together with whether torch ended up imported. Exits with status 1
+if any command is slower than --max-seconds or loads torch.
+"""
+import sys
+import time
+import argparse
+import subprocess
+
+TORCH_CHECK = "import sys; {stmt}; sys.stdout.write(str('torch' in sys.modules))"
+
+COMMANDS = [
+    ("import main", [sys.executable, "-c", TORCH_CHECK.format(stmt="import main")]),
+    ("import extraction.headers", [sys.executable, "-c", TORCH_CHECK.format(stmt="import extraction.headers")]),
+    ("main.py --help", [sys.executable, "main.py", "--help"]),
+    ("accuracy.py --help", [sys.executable, "accuracy.py", "--help"]),
+]
+
+
+def time_command(argv, repeats):
+    best = float("inf")
+    output = ""
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = subprocess.run(argv, capture_output=True, text=True, check=True)
+        best = min(best, time.perf_counter() - start)
+        output = result.stdout
+    return best, output
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--max-seconds", type=float, default=1.0)
+    args = parser.parse_args()
+
+    baseline, _ = time_command([sys.executable, "-c", "pass"], args.repeats)
+    print(f"{'python -c pass':<28} {baseline:6.3f} s")
+
+    failed = False
+    for name, argv in COMMANDS:
+        seconds, output = time_command(argv, args.repeats)
+        loaded_torch = output.strip() == "True"
+        note = "  (torch imported!)" if loaded_torch else ""
+        print(f"{name:<28} {seconds:6.3f} s{note}")
+        if seconds > args.max_seconds or loaded_torch:
+            failed = True
+
+    if failed:
+        print(f"FAIL: an entry point exceeded {args.max_seconds:.2f}s or imported torch")
+        raise SystemExit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
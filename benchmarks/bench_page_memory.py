@@ -0,0 +1,120 @@
+"""Peak memory of page dicts vs the compact PageStore (and embedding storage options)
+
+Run from the repository root:
+
+    python -m benchmarks.bench_page_memory
+    python -m benchmarks.bench_page_memory --pages 20000 --embedding model --storage float32 float16 memmap
+
+Generates one synthetic digital PDF, then runs extract_pages, get_embeddings,
+DBSCAN + postprocess_clusters and generate_output (streamed to a file) once
+per configuration, each in a fresh process so peak RSS is not shared. Reports
+the peak RSS after each stage and the pages' own footprint (deep size of the
+dicts, or the PageStore's buffer and arrays) plus the embeddings' resident
+bytes. Every configuration writes its own output file; the script exits with
+status 1 if any of them differs from the first (page dicts, float32).
+
+Peak RSS is the process high-water mark, so a stage's figure is the peak so
+far, not memory attributable to that stage alone.
+"""
+import os
+import sys
+import json
+import argparse
+import tempfile
+import subprocess
+from benchmarks.synthetic_pdf import write_pdf
+
+STAGES = ("extraction", "embedding", "clustering", "postprocessing", "output")
+
+
+def deep_size(pages):
+    """Approximate bytes of a list of page dicts, including nested dicts and strings"""
+    size = sys.getsizeof(pages)
+    for page in pages:
+        size += sys.getsizeof(page) + sys.getsizeof(page["metadata"])
+        size += sum(sys.getsizeof(value) for value in page.values() if not isinstance(value, dict))
+        size += sum(sys.getsizeof(value) for value in page["metadata"].values())
+    return size
+
+
+def run_child(pdf_path, compact, storage, embedding, output_path):
+    """Run the pipeline once in this process and print its stage records as JSON"""
+    import numpy as np
+    import preprocessing.hybrid_pdf as hybrid_pdf
+    import clustering.embeddings as embeddings
+    from instrumentation import Tracer
+    from main import assign_labels, generate_output
+
+    hybrid_pdf.COMPACT_PAGES = compact
+    embeddings.EMBEDDING_STORAGE = storage
+    embeddings.EMBEDDING_CACHE_ENABLED = False
+    if embedding == "stub":
+        embeddings.EMBEDDING_BACKEND = "hash"
+    embeddings.warm_up()
+
+    tracer = Tracer(pdf_path)
+    pages = hybrid_pdf.extract_pages(pdf_path, tracer=tracer)
+    with tracer.stage("embedding", pages=len(pages)):
+        vectors = embeddings.get_embeddings(pages)
+    labels = assign_labels(pages, vectors, "dbscan", tracer)
+    with tracer.stage("output", pages=len(pages)):
+        generate_output(pages, labels, output_path, return_rows=False)
+
+    print(json.dumps({
+        "pages_mb": (pages.nbytes() if compact else deep_size(pages)) / 2**20,
+        "embeddings_mb": 0.0 if isinstance(vectors, np.memmap) else vectors.nbytes / 2**20,
+        "stages": {record["stage"]: record["peak_rss_mb"] for record in tracer.stages},
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=20000)
+    parser.add_argument("--embedding", choices=["stub", "model"], default="stub",
+                        help="stub: hashing encoder, no model download; model: EMBEDDING_BACKEND from config")
+    parser.add_argument("--storage", nargs="+", choices=["float32", "float16", "memmap"], default=["float32", "float16"])
+    parser.add_argument("--child", nargs=4, metavar=("PDF", "COMPACT", "STORAGE", "OUTPUT"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        pdf_path, compact, storage, output_path = args.child
+        run_child(pdf_path, compact == "1", storage, args.embedding, output_path)
+        return
+
+    configurations = [(False, "float32")] + [(True, storage) for storage in args.storage]
+    with tempfile.TemporaryDirectory() as work_dir:
+        pdf_path = os.path.join(work_dir, "digital.pdf")
+        write_pdf(pdf_path, args.pages)
+        outputs = []
+
+        print(f"{args.pages} pages; peak RSS so far (MB) at the end of each stage")
+        print(f"{'pages':<8}{'embeddings':<12}{'pages MB':>9}{'emb MB':>8}" + "".join(f"{s[:10]:>11}" for s in STAGES))
+        for compact, storage in configurations:
+            output_path = os.path.join(work_dir, f"output_{'store' if compact else 'dicts'}_{storage}.csv")
+            outputs.append(output_path)
+            command = [sys.executable, "-m", "benchmarks.bench_page_memory", "--embedding", args.embedding,
+                       "--child", pdf_path, "1" if compact else "0", storage, output_path]
+            output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+            # Only the last line is the result (libraries may print warnings to stdout)
+            result = json.loads(output.strip().splitlines()[-1])
+            stages = result["stages"]
+            print(
+                f"{'store' if compact else 'dicts':<8}{storage:<12}{result['pages_mb']:>9.1f}{result['embeddings_mb']:>8.1f}"
+                + "".join(f"{stages.get(stage) or 0:>11.1f}" for stage in STAGES)
+            )
+
+        with open(outputs[0], 'rb') as f:
+            reference = f.read()
+        differing = []
+        for output_path in outputs[1:]:
+            with open(output_path, 'rb') as f:
+                if f.read() != reference:
+                    differing.append(os.path.basename(output_path))
+    if differing:
+        print(f"Output differs from the page-dict run: {', '.join(differing)}")
+        raise SystemExit(1)
+    print(f"All {len(outputs)} outputs are byte-identical")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""Compare embedding full page text vs page signatures (EMBEDDING_INPUT)
+
+Run from the repository root:
+
+    python -m benchmarks.bench_page_signature
+    python -m benchmarks.bench_page_signature --pdf record.pdf --embedding stub --repeats 3
+
+Builds the page signatures of a digital PDF (default sample_input.pdf) and
+encodes both the full text and the signatures with the configured model,
+reporting tokens per page (before truncation), encode time and the agreement
+(adjusted Rand index) of the DBSCAN labels after postprocess_clusters.
+Exits with status 1 when the agreement is below --min-ari.
+"""
+import time
+import argparse
+import fitz  # PyMuPDF
+import clustering.embeddings as embeddings
+from clustering.embeddings import encode_texts, get_model, warm_up
+from clustering.clustering import cluster_pages
+from preprocessing.page_signature import page_blocks, build_signatures
+from main import postprocess_clusters
+
+
+def load_pages(pdf_path):
+    """Text-layer pages of pdf_path, each with its "signature" """
+    pages = []
+    pages_blocks = []
+    with fitz.open(pdf_path) as doc:
+        for page in doc:
+            pages.append({"text": page.get_text(), "metadata": {"page_num": page.number + 1}})
+            pages_blocks.append(page_blocks(page))
+    for page, signature in zip(pages, build_signatures(pages_blocks)):
+        page["signature"] = signature or page["text"]
+    return pages
+
+
+def measure(pages, key, repeats):
+    """Tokens per page, fastest encode time and labels for one embedding input"""
+    texts = [page[key] for page in pages]
+    model = get_model()
+    tokens = [len(ids) for ids in model.tokenizer(texts, truncation=False)["input_ids"]]
+    best = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        vectors = encode_texts(texts)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    labels = postprocess_clusters(pages, cluster_pages(vectors))
+    return {
+        "tokens_per_page": sum(tokens) / len(texts),
+        "truncated_pages": sum(length > model.max_seq_length for length in tokens),
+        "seconds": best,
+        "labels": labels,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pdf", default="sample_input.pdf")
+    parser.add_argument("--embedding", choices=["stub", "model"], default="model",
+                        help="stub: hashing encoder, no model download; model: EMBEDDING_BACKEND from config")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--min-ari", type=float, default=0.9,
+                        help="Lowest acceptable label agreement between signatures and full text")
+    parser.add_argument("--show", type=int, default=0, help="Print the signatures of the first N pages")
+    args = parser.parse_args()
+
+    from sklearn.metrics import adjusted_rand_score, rand_score
+
+    embeddings.EMBEDDING_CACHE_ENABLED = False
+    if args.embedding == "stub":
+        embeddings.EMBEDDING_BACKEND = "hash"
+    warm_up()
+
+    pages = load_pages(args.pdf)
+    for page in pages[:args.show]:
+        print(f"--- page {page['metadata']['page_num']} ---\n{page['signature']}")
+
+    results = {key: measure(pages, key, args.repeats) for key in ("text", "signature")}
+    print(f"{len(pages)} pages of {args.pdf}")
+    print(f"{'input':<12}{'tokens/page':>12}{'truncated':>11}{'encode s':>10}{'ms/page':>10}{'segments':>10}")
+    for key, result in results.items():
+        print(
+            f"{key:<12}{result['tokens_per_page']:>12.1f}{result['truncated_pages']:>11}"
+            f"{result['seconds']:>10.3f}{result['seconds'] / len(pages) * 1e3:>10.2f}"
+            f"{len(set(result['labels'])):>10}"
+        )
+
+    ari = adjusted_rand_score(results["text"]["labels"], results["signature"]["labels"])
+    agreement = rand_score(results["text"]["labels"], results["signature"]["labels"])
+    print(f"Label agreement: adjusted Rand index {ari:.3f}, page pairs grouped alike {agreement:.1%}")
+    if ari < args.min_ari:
+        print(f"Signature labels diverge from full-text labels (ARI < {args.min_ari})")
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""Pipeline stage benchmark on synthetic PDFs, with regression thresholds
+
+Run from the repository root:
+
+    python -m benchmarks.bench_pipeline --embedding stub
+    python -m benchmarks.bench_pipeline --pages 10 1000 20000 --scanned-pages 10 100
+    python -m benchmarks.bench_pipeline --kinds digital --output bench.json --thresholds benchmarks/thresholds.json
+
+Generates digital and rasterised ("scanned") PDFs with benchmarks.synthetic_pdf,
+then times extract_digital_pages / extract_scanned_pages, get_embeddings,
+cluster_pages, postprocess_clusters and generate_output on each. Results
+(wall and CPU seconds, peak RSS so far, seconds per page) are written as JSON.
+Peak RSS is the process high-water mark, so it only grows from stage to
+stage (and from run to run).
+
+--embedding stub uses the weight-free hashing encoder (EMBEDDING_BACKEND
+"hash") so the suite runs without downloading a model. The embedding cache is
+disabled so every run encodes.
+
+Exits with status 1 when a stage's seconds per page exceeds its threshold on
+any run of at least --min-pages pages. Thresholds are per stage under
+"seconds_per_page"; a section named after the embedding mode ("stub" or
+"model") overrides them.
+"""
+import os
+import json
+import argparse
+import tempfile
+import platform
+from datetime import datetime
+import clustering.embeddings as embeddings
+from clustering.embeddings import get_embeddings, warm_up
+from clustering.clustering import cluster_pages
+from preprocessing.digital_pdf import extract_digital_pages
+from preprocessing.scanned_pdf import extract_scanned_pages
+from extraction.entities import page_analysis_cache
+from instrumentation import Tracer
+from main import postprocess_clusters, generate_output
+from benchmarks.synthetic_pdf import write_pdf
+
+THRESHOLDS_FILE = os.path.join(os.path.dirname(__file__), "thresholds.json")
+
+
+def timed(tracer, name, pages, repeats, func, *args):
+    """Run func repeats times, keep the fastest run's stage record; returns func's result"""
+    best = None
+    result = None
+    for _ in range(repeats):
+        trial = Tracer()
+        with trial.stage(name, pages=pages):
+            result = func(*args)
+        record = trial.stages[0]
+        if best is None or record["wall_seconds"] < best["wall_seconds"]:
+            best = record
+    best["seconds_per_page"] = best["wall_seconds"] / max(pages, 1)
+    tracer.end_stage(best)
+    return result
+
+
+def run_pipeline(kind, num_pages, work_dir, repeats, ocr_workers, dpi):
+    """Benchmark every stage on one synthetic PDF; returns the stage records"""
+    pdf_path = os.path.join(work_dir, f"{kind}_{num_pages}.pdf")
+    write_pdf(pdf_path, num_pages, scanned=(kind == "scanned"), dpi=dpi)
+    page_analysis_cache.clear()
+
+    tracer = Tracer(pdf_path)
+    if kind == "scanned":
+        pages = timed(tracer, "extract_scanned_pages", num_pages, repeats, extract_scanned_pages, pdf_path, ocr_workers)
+    else:
+        pages = timed(tracer, "extract_digital_pages", num_pages, repeats, extract_digital_pages, pdf_path)
+    vectors = timed(tracer, "get_embeddings", num_pages, repeats, get_embeddings, pages)
+    raw_labels = timed(tracer, "cluster_pages", num_pages, repeats, cluster_pages, vectors)
+    labels = timed(tracer, "postprocess_clusters", num_pages, repeats, postprocess_clusters, pages, raw_labels)
+    output_path = os.path.join(work_dir, f"{kind}_{num_pages}.csv")
+    timed(tracer, "generate_output", num_pages, repeats, generate_output, pages, labels, output_path)
+    return tracer.stages
+
+
+def load_thresholds(path, embedding):
+    with open(path, 'r') as f:
+        data = json.load(f)
+    thresholds = dict(data.get("seconds_per_page", {}))
+    thresholds.update(data.get(embedding, {}))
+    return thresholds
+
+
+def check_thresholds(runs, thresholds, min_pages):
+    """Messages for every stage slower per page than its threshold"""
+    failures = []
+    for run in runs:
+        if run["pages"] < min_pages:
+            continue
+        for stage in run["stages"]:
+            limit = thresholds.get(stage["stage"])
+            if limit is not None and stage["seconds_per_page"] > limit:
+                failures.append(
+                    f"{run['kind']} {run['pages']} pages: {stage['stage']} "
+                    f"{stage['seconds_per_page'] * 1e3:.3f} ms/page > {limit * 1e3:.3f} ms/page"
+                )
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--kinds", nargs="+", choices=["digital", "scanned"], default=["digital", "scanned"])
+    parser.add_argument("--pages", type=int, nargs="+", default=[10, 1000, 5000],
+                        help="Digital PDF sizes (10 to 20000 pages)")
+    parser.add_argument("--scanned-pages", type=int, nargs="+", default=[10, 50],
+                        help="Scanned PDF sizes (OCR is slow; keep these small)")
+    parser.add_argument("--embedding", choices=["stub", "model"], default="stub",
+                        help="stub: hashing encoder, no model download; model: EMBEDDING_BACKEND from config")
+    parser.add_argument("--repeats", type=int, default=1)
+    parser.add_argument("--ocr-workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--dpi", type=int, default=100, help="Raster resolution of scanned PDFs")
+    parser.add_argument("--output", default=os.path.join("output", "benchmark.json"))
+    parser.add_argument("--thresholds", default=THRESHOLDS_FILE)
+    parser.add_argument("--min-pages", type=int, default=1000,
+                        help="Smallest run checked against thresholds (fixed costs dominate tiny runs)")
+    args = parser.parse_args()
+
+    # Every run encodes from scratch; the stub needs no weights
+    embeddings.EMBEDDING_CACHE_ENABLED = False
+    if args.embedding == "stub":
+        embeddings.EMBEDDING_BACKEND = "hash"
+    warm_up()
+
+    sizes = {"digital": args.pages, "scanned": args.scanned_pages}
+    runs = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        for kind in args.kinds:
+            for num_pages in sorted(sizes[kind]):
+                stages = run_pipeline(kind, num_pages, work_dir, args.repeats, args.ocr_workers, args.dpi)
+                runs.append({"kind": kind, "pages": num_pages, "stages": stages})
+                print(f"\n{kind}, {num_pages} pages")
+                print(f"{'stage':<24}{'wall s':>10}{'cpu s':>10}{'ms/page':>10}{'peak so far MB':>16}")
+                for stage in stages:
+                    print(
+                        f"{stage['stage']:<24}{stage['wall_seconds']:>10.3f}{stage['cpu_seconds']:>10.3f}"
+                        f"{stage['seconds_per_page'] * 1e3:>10.3f}{stage['peak_rss_mb'] or 0:>16.1f}"
+                    )
+
+    thresholds = load_thresholds(args.thresholds, args.embedding) if args.thresholds else {}
+    failures = check_thresholds(runs, thresholds, args.min_pages)
+
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, 'w') as f:
+        json.dump({
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "platform": platform.platform(),
+            "python": platform.python_version(),
+            "cpu_count": os.cpu_count(),
+            "embedding": args.embedding,
+            "embedding_model": embeddings.model_id(),
+            "repeats": args.repeats,
+            "thresholds": thresholds,
+            "runs": runs,
+            "failures": failures
+        }, f, indent=2)
+    print(f"\nResults written to {args.output}")
+
+    if failures:
+        print("FAIL: regression thresholds exceeded")
+        for failure in failures:
+            print(f"  {failure}")
+        raise SystemExit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
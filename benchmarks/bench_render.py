@@ -0,0 +1,102 @@
+"""Compare page rendering for OCR: PyMuPDF pixmaps vs poppler (pdf2image)
+
+Run from the repository root:
+
+    python -m benchmarks.bench_render
+    python -m benchmarks.bench_render --pdf scanned.pdf --pages 20 --dpi 150 300 --modes rgb gray binary
+
+Renders the first --pages pages of a PDF (by default a synthetic rasterised
+one) with each backend, DPI and colour mode, one page at a time as the OCR
+workers do. Each configuration runs in a fresh process, so peak RSS is not
+carried over between rows. Reports render time per page, image size per
+page, that process's peak RSS, how far rendering raised it above the
+process's peak before the first page, and the peak RSS of poppler's child
+processes. A backend that cannot run here (e.g. poppler not installed) is
+reported and skipped.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+from preprocessing.scanned_pdf import render_page_range
+from instrumentation import peak_rss_mb
+from benchmarks.synthetic_pdf import write_pdf
+
+
+def bench(pdf_path, pages, backend, dpi, color_mode):
+    """Seconds and image bytes per page for one configuration"""
+    seconds = 0.0
+    image_bytes = 0
+    for page_num in range(1, pages + 1):
+        start = time.perf_counter()
+        images = render_page_range(pdf_path, page_num, page_num, backend, dpi, color_mode)
+        seconds += time.perf_counter() - start
+        for image in images:
+            image_bytes += len(image.tobytes())
+            image.close()
+    return seconds / pages, image_bytes / pages
+
+
+def run_child(pdf_path, pages, backend, dpi, color_mode):
+    """Benchmark one configuration in this process and print the result as JSON"""
+    baseline = peak_rss_mb() or 0
+    try:
+        seconds, image_bytes = bench(pdf_path, pages, backend, dpi, color_mode)
+    except Exception as e:
+        print(json.dumps({"error": f"{type(e).__name__}: {e}"}))
+        return
+    print(json.dumps({
+        "seconds": seconds,
+        "image_bytes": image_bytes,
+        "peak_mb": peak_rss_mb() or 0,
+        "render_mb": (peak_rss_mb() or 0) - baseline,
+        "child_mb": peak_rss_mb(children=True) or 0,
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pdf", help="PDF to render (default: a synthetic scanned PDF)")
+    parser.add_argument("--pages", type=int, default=10)
+    parser.add_argument("--backends", nargs="+", choices=["pymupdf", "poppler"], default=["pymupdf", "poppler"])
+    parser.add_argument("--dpi", type=int, nargs="+", default=[200])
+    parser.add_argument("--modes", nargs="+", choices=["rgb", "gray", "binary"], default=["rgb", "gray", "binary"])
+    parser.add_argument("--child", nargs=4, metavar=("PDF", "BACKEND", "DPI", "MODE"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        pdf_path, backend, dpi, color_mode = args.child
+        run_child(pdf_path, args.pages, backend, int(dpi), color_mode)
+        return
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        pdf_path = args.pdf
+        if pdf_path is None:
+            pdf_path = os.path.join(work_dir, "scanned.pdf")
+            write_pdf(pdf_path, args.pages, scanned=True, dpi=150)
+
+        print(f"{'backend':<10}{'dpi':>6}{'mode':>8}{'ms/page':>10}{'MB/page':>10}{'peak MB':>10}"
+              f"{'render MB':>11}{'child MB':>10}")
+        for backend in args.backends:
+            for dpi in args.dpi:
+                for color_mode in args.modes:
+                    command = [sys.executable, "-m", "benchmarks.bench_render", "--pages", str(args.pages),
+                               "--child", pdf_path, backend, str(dpi), color_mode]
+                    output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+                    # Only the last line is the result (libraries may print warnings to stdout)
+                    result = json.loads(output.strip().splitlines()[-1])
+                    if "error" in result:
+                        print(f"{backend:<10}{dpi:>6}{color_mode:>8}  unavailable: {result['error']}")
+                        break
+                    print(
+                        f"{backend:<10}{dpi:>6}{color_mode:>8}{result['seconds'] * 1e3:>10.1f}"
+                        f"{result['image_bytes'] / 2**20:>10.2f}{result['peak_mb']:>10.1f}"
+                        f"{result['render_mb']:>11.1f}{result['child_mb']:>10.1f}"
+                    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Check the ONNX embedding backend against torch and compare latency
+
+Run from the repository root:
+
+    python -m benchmarks.compare_onnx_backend
+    python -m benchmarks.compare_onnx_backend --pdf other.pdf --onnx-dir models/onnx --repeats 5
+
+Exports the int8 ONNX model on first use. Exits with status 1 if the cluster
+labels (raw DBSCAN and after postprocess_clusters) differ between backends.
+"""
+import time
+import argparse
+import numpy as np
+from config import EMBEDDING_MODEL, EMBEDDING_MAX_SEQ_LENGTH, ONNX_QUANTIZE
+from clustering.embeddings import encode_texts, load_torch_model, onnx_model_dir
+from clustering.onnx_backend import OnnxEncoder, export_onnx_model, onnx_model_exists
+from clustering.clustering import cluster_pages
+from preprocessing.hybrid_pdf import extract_pages
+from main import postprocess_clusters
+
+
+def time_encode(texts, model, repeats):
+    encode_texts(texts[:1], model=model)  # first-call overhead (allocations, graph optimisation)
+    best = float("inf")
+    embeddings = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        embeddings = encode_texts(texts, model=model)
+        best = min(best, time.perf_counter() - start)
+    return embeddings, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pdf", default="sample_input.pdf")
+    parser.add_argument("--onnx-dir", default=onnx_model_dir())
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    pages = extract_pages(args.pdf)
+    texts = [page["text"] for page in pages]
+
+    torch_model = load_torch_model()
+    if not onnx_model_exists(args.onnx_dir, EMBEDDING_MODEL, ONNX_QUANTIZE, EMBEDDING_MAX_SEQ_LENGTH):
+        export_onnx_model(torch_model, args.onnx_dir, quantize=ONNX_QUANTIZE, source_model=EMBEDDING_MODEL)
+    onnx_model = OnnxEncoder(args.onnx_dir)
+
+    torch_embeddings, torch_seconds = time_encode(texts, torch_model, args.repeats)
+    onnx_embeddings, onnx_seconds = time_encode(texts, onnx_model, args.repeats)
+
+    similarity = np.sum(torch_embeddings * onnx_embeddings, axis=1)
+    torch_labels = cluster_pages(torch_embeddings)
+    onnx_labels = cluster_pages(onnx_embeddings)
+    raw_match = np.array_equal(torch_labels, onnx_labels)
+    final_match = postprocess_clusters(pages, torch_labels) == postprocess_clusters(pages, onnx_labels)
+
+    print(f"Document: {args.pdf} ({len(pages)} pages)")
+    print(f"{'backend':<12}{'total s':>10}{'ms/page':>10}")
+    print(f"{'torch':<12}{torch_seconds:>10.3f}{torch_seconds / len(pages) * 1e3:>10.1f}")
+    print(f"{'onnx':<12}{onnx_seconds:>10.3f}{onnx_seconds / len(pages) * 1e3:>10.1f}")
+    print(f"Speed-up: {torch_seconds / onnx_seconds:.2f}x")
+    print(f"Cosine similarity torch vs onnx: min {similarity.min():.4f}, mean {similarity.mean():.4f}")
+    print(f"DBSCAN labels identical: {raw_match}")
+    print(f"Postprocessed labels identical: {final_match}")
+
+    if not (raw_match and final_match):
+        print("FAIL: ONNX backend changes the clustering")
+        raise SystemExit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""Synthetic medical-record PDFs for benchmarks
+
+Generate a file from the repository root:
+
+    python -m benchmarks.synthetic_pdf out.pdf --pages 1000
+    python -m benchmarks.synthetic_pdf scanned.pdf --pages 50 --scanned --dpi 150
+
+Documents are runs of 1-12 pages. The first page of each carries a header
+taken from config/header_patterns.json plus patient, date and provider lines;
+continuation pages carry only body text. --scanned rasterises every page so
+the PDF has no text layer.
+"""
+import re
+import random
+import argparse
+import fitz  # PyMuPDF
+from extraction.headers import load_header_patterns, sre_parse
+
+FIRST_NAMES = ["Jane", "John", "Maria", "Wei", "Aisha", "Carlos", "Olga", "Ravi"]
+LAST_NAMES = ["Doe", "Smith", "Garcia", "Chen", "Khan", "Lopez", "Ivanova", "Patel"]
+BODY_WORDS = (
+    "patient reports mild pain stable vitals afebrile alert oriented medication tolerated "
+    "plan continue monitor labs reviewed follow up clinic dressing clean dry intact "
+    "blood pressure heart rate respiratory rate oxygen saturation diet ambulating"
+).split()
+CATEGORY_EXAMPLES = {
+    sre_parse.CATEGORY_DIGIT: "0",
+    sre_parse.CATEGORY_SPACE: " ",
+    sre_parse.CATEGORY_WORD: "a",
+}
+
+
+def _example(parsed):
+    """Shortest text built from a parsed regex, taking the first branch of alternations"""
+    out = []
+    for op, arg in parsed:
+        if op is sre_parse.LITERAL:
+            out.append(chr(arg))
+        elif op is sre_parse.ANY:
+            out.append("x")
+        elif op is sre_parse.IN:
+            for item_op, item_arg in arg:
+                if item_op is sre_parse.LITERAL:
+                    out.append(chr(item_arg))
+                    break
+                if item_op is sre_parse.RANGE:
+                    out.append(chr(item_arg[0]))
+                    break
+                if item_op is sre_parse.CATEGORY:
+                    out.append(CATEGORY_EXAMPLES.get(item_arg, "a"))
+                    break
+        elif op is sre_parse.SUBPATTERN:
+            out.append(_example(arg[-1]))
+        elif op is sre_parse.BRANCH:
+            out.append(_example(arg[1][0]))
+        elif op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT):
+            out.append(_example(arg[2]) * arg[0])
+        # Anchors and lookarounds contribute no text
+    return "".join(out)
+
+
+def header_vocabulary(patterns=None):
+    """Sample header line for every pattern whose generated example it actually matches"""
+    vocabulary = []
+    for pattern, header in patterns if patterns is not None else load_header_patterns():
+        try:
+            text = _example(sre_parse.parse(pattern)).strip()
+        except re.error:
+            continue
+        if text and re.search(pattern, text):
+            vocabulary.append((text.upper(), header))
+    return vocabulary
+
+
+def synthetic_pages(num_pages, seed=0, vocabulary=None):
+    """Page texts for num_pages pages, with the header name of each document start (None on continuations)"""
+    rng = random.Random(seed)
+    vocabulary = vocabulary or header_vocabulary()
+    pages = []
+    mrn = 100000
+    while len(pages) < num_pages:
+        header_text, header = rng.choice(vocabulary)
+        name = f"{rng.choice(LAST_NAMES)}, {rng.choice(FIRST_NAMES)}"
+        provider = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}, MD"
+        date = f"{rng.randint(1, 12)}/{rng.randint(1, 28)}/20{rng.randint(10, 24)}"
+        mrn += rng.randint(1, 50)
+        for position in range(rng.randint(1, 12)):
+            if len(pages) >= num_pages:
+                break
+            lines = []
+            if position == 0:
+                lines += [
+                    header_text,
+                    f"Patient: {name}",
+                    f"ABC Name MRN: {mrn} DOB: 1/1/1970 Legal Sex: F",
+                    f"Date of Service: {date}",
+                ]
+            lines += [" ".join(rng.choice(BODY_WORDS) for _ in range(12)) for _ in range(rng.randint(8, 20))]
+            if position == 0:
+                lines.append(f"Electronically signed by {provider} on {date}")
+            lines.append(f"Page {len(pages) + 1}")
+            pages.append(("\n".join(lines), header if position == 0 else None))
+    return pages
+
+
+def write_pdf(path, num_pages, scanned=False, dpi=100, seed=0):
+    """Write a synthetic PDF and return the per-page header names (None on continuations)"""
+    pages = synthetic_pages(num_pages, seed)
+    doc = fitz.open()
+    for text, _ in pages:
+        page = doc.new_page()
+        page.insert_textbox(fitz.Rect(50, 50, page.rect.width - 50, page.rect.height - 50), text, fontsize=10)
+    if scanned:
+        raster = fitz.open()
+        for page in doc:
+            pixmap = page.get_pixmap(dpi=dpi, colorspace=fitz.csGRAY)
+            raster.new_page(width=page.rect.width, height=page.rect.height).insert_image(page.rect, pixmap=pixmap)
+        doc.close()
+        doc = raster
+    doc.save(path, garbage=3, deflate=True)
+    doc.close()
+    return [header for _, header in pages]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("output")
+    parser.add_argument("--pages", type=int, default=100)
+    parser.add_argument("--scanned", action="store_true", help="Rasterise pages (no text layer)")
+    parser.add_argument("--dpi", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    write_pdf(args.output, args.pages, args.scanned, args.dpi, args.seed)
+    print(f"Wrote {args.pages} {'scanned' if args.scanned else 'digital'} pages to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,59 @@
-from sklearn.cluster import DBSCAN
-from sklearn.metrics.pairwise import cosine_distances
-from config import DBSCAN_EPS, MIN_SAMPLES
+from config import DBSCAN_EPS, MIN_SAMPLES, CLUSTERING_BLOCK_SIZE, SPARSE_CLUSTERING_MIN_PAGES
+
+def radius_neighbors_graph(embeddings, eps=DBSCAN_EPS, block_size=CLUSTERING_BLOCK_SIZE):
+    """Sparse cosine-distance graph holding only the pairs within eps
+
+    Rows must be L2-normalized, as get_embeddings returns them, so distances
+    are 1 - dot products. They are computed one block_size x block_size tile
+    at a time, each tile upcast to float32 on its own, so float16 or memmap
+    embeddings are never copied whole and memory is O(n*k) for k neighbours
+    per page instead of the dense O(n^2) matrix.
+    """
+    import numpy as np
+    from scipy.sparse import csr_matrix
+
+    n = embeddings.shape[0]
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    indices = []
+    data = []
+    for start in range(0, n, block_size):
+        stop = min(start + block_size, n)
+        block = np.asarray(embeddings[start:stop], dtype=np.float32)
+        block_rows, block_cols, block_data = [], [], []
+        for col_start in range(0, n, block_size):
+            col_stop = min(col_start + block_size, n)
+            distances = block @ np.asarray(embeddings[col_start:col_stop], dtype=np.float32).T
+            distances *= -1
+            distances += 1
+            np.clip(distances, 0, 2, out=distances)
+            if col_start == start:
+                distances[np.arange(stop - start), np.arange(stop - start)] = 0.0
+            rows, cols = np.nonzero(distances <= eps)
+            block_rows.append(rows)
+            block_cols.append((cols + col_start).astype(np.int32))
+            block_data.append(distances[rows, cols])
+
+        # Row-major within each tile and tiles left to right, so a stable sort by row keeps columns ascending
+        rows = np.concatenate(block_rows)
+        order = np.argsort(rows, kind='stable')
+        indices.append(np.concatenate(block_cols)[order])
+        data.append(np.concatenate(block_data)[order])
+        indptr[start + 1:stop + 1] = indptr[start] + np.cumsum(np.bincount(rows, minlength=stop - start))
+
+    return csr_matrix(
+        (np.concatenate(data) if data else np.zeros(0, dtype=np.float32),
+         np.concatenate(indices) if indices else np.zeros(0, dtype=np.int32),
+         indptr),
+        shape=(n, n)
+    )
 
 def cluster_pages(embeddings):
-    distance_matrix = cosine_distances(embeddings)
+    import numpy as np
+    from sklearn.cluster import DBSCAN
     clustering = DBSCAN(eps=DBSCAN_EPS, min_samples=MIN_SAMPLES, metric='precomputed')
+    if len(embeddings) >= SPARSE_CLUSTERING_MIN_PAGES:
+        return clustering.fit_predict(radius_neighbors_graph(embeddings))
+    from sklearn.metrics.pairwise import cosine_distances
+    # Small documents: the n x n matrix dwarfs a float32 copy of float16 embeddings
+    distance_matrix = cosine_distances(np.asarray(embeddings, dtype=np.float32))
     return clustering.fit_predict(distance_matrix)
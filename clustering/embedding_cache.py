@@ -0,0 +1,211 @@
+import os
+import re
+import json
+import hashlib
+import logging
+import threading
+from contextlib import contextmanager
+import numpy as np
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process locking
+    fcntl = None
+from config import EMBEDDING_CACHE_DIR, EMBEDDING_CACHE_MAX_MB
+
+logger = logging.getLogger(__name__)
+
+INDEX_FILE = "index.json"
+VECTORS_FILE = "vectors.f32"
+LOCK_FILE = "lock"
+INITIAL_CAPACITY = 1024
+
+
+def normalize_text(text):
+    """Collapse whitespace so layout-only differences share a cache entry"""
+    return " ".join(text.split())
+
+
+class EmbeddingCache:
+    """Content-addressed on-disk store of normalized page embeddings
+
+    One store per model lives under cache_dir/<model name>. Vectors are rows
+    of a memory-mapped float32 matrix; index.json maps a hash of the
+    normalized page text to its row and a last-used counter. When the matrix
+    would exceed max_bytes, the least recently used rows are reused.
+
+    Several processes (batch, server, app) may share a store: lookups hold a
+    shared lock and writes an exclusive one on cache_dir/<model>/lock, and
+    each reloads the index first if another process rewrote it. put_many
+    writes the vectors and the index before releasing the lock; hits only
+    update recency in memory, which is saved with the next put_many.
+    """
+
+    def __init__(self, model_name, cache_dir=EMBEDDING_CACHE_DIR, max_bytes=EMBEDDING_CACHE_MAX_MB * 1024 * 1024):
+        self.model_name = model_name
+        self.path = os.path.join(cache_dir, re.sub(r'[^A-Za-z0-9._-]+', '_', model_name))
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._dim = None
+        self._capacity = 0
+        self._clock = 0
+        self._entries = {}  # key -> [row, last_used]
+        self._free = []
+        self._vectors = None
+        self._touched = set()  # keys hit since the index was last written
+        self._index_stamp = None
+        with self._file_lock(exclusive=False):
+            self._load()
+
+    @staticmethod
+    def key(text):
+        return hashlib.blake2b(normalize_text(text).encode('utf-8', 'surrogatepass'), digest_size=16).hexdigest()
+
+    @contextmanager
+    def _file_lock(self, exclusive):
+        """Cross-process lock on the store (no-op where fcntl is unavailable)"""
+        if fcntl is None or (not exclusive and not os.path.isdir(self.path)):
+            yield
+            return
+        os.makedirs(self.path, exist_ok=True)
+        with open(os.path.join(self.path, LOCK_FILE), 'a') as f:
+            fcntl.flock(f, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _stamp(self):
+        try:
+            stat = os.stat(os.path.join(self.path, INDEX_FILE))
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+    def _refresh(self):
+        """Reload the index if another process rewrote it (call with the file lock held)"""
+        if self._stamp() != self._index_stamp:
+            self._load()
+
+    def _load(self):
+        index_path = os.path.join(self.path, INDEX_FILE)
+        vectors_path = os.path.join(self.path, VECTORS_FILE)
+        self._index_stamp = self._stamp()
+        try:
+            with open(index_path, 'r') as f:
+                index = json.load(f)
+            self._dim = index['dim']
+            self._capacity = index['capacity']
+            self._clock = max(self._clock, index['clock'])
+            self._entries = index['entries']
+            self._free = index['free']
+            self._vectors = np.memmap(vectors_path, dtype=np.float32, mode='r+', shape=(self._capacity, self._dim))
+        except (FileNotFoundError, json.JSONDecodeError, KeyError, ValueError):
+            # Missing or inconsistent store: start empty
+            self._dim = None
+            self._capacity = 0
+            self._entries = {}
+            self._free = []
+            self._vectors = None
+
+    @property
+    def max_rows(self):
+        return max(1, self.max_bytes // (4 * self._dim))
+
+    def _resize(self, capacity):
+        vectors_path = os.path.join(self.path, VECTORS_FILE)
+        os.makedirs(self.path, exist_ok=True)
+        if self._vectors is not None:
+            self._vectors.flush()
+            self._vectors = None
+        with open(vectors_path, 'ab') as f:
+            f.truncate(capacity * self._dim * 4)
+        self._free.extend(range(self._capacity, capacity))
+        self._capacity = capacity
+        self._vectors = np.memmap(vectors_path, dtype=np.float32, mode='r+', shape=(capacity, self._dim))
+
+    def _reserve_rows(self, count):
+        """Return `count` free rows, growing the matrix or evicting LRU entries"""
+        if len(self._free) < count and self._capacity < self.max_rows:
+            wanted = self._capacity + count - len(self._free)
+            capacity = max(wanted, self._capacity * 2, INITIAL_CAPACITY)
+            self._resize(min(capacity, self.max_rows))
+
+        shortfall = count - len(self._free)
+        if shortfall > 0:
+            oldest = sorted(self._entries.items(), key=lambda item: item[1][1])[:shortfall]
+            for key, (row, _) in oldest:
+                del self._entries[key]
+                self._free.append(row)
+
+        rows = self._free[:count]
+        del self._free[:count]
+        return rows
+
+    def get_many(self, keys):
+        """Return {position: vector} for the keys present in the cache"""
+        found = {}
+        with self._lock, self._file_lock(exclusive=False):
+            self._refresh()
+            for position, key in enumerate(keys):
+                entry = self._entries.get(key)
+                if entry is None:
+                    self.misses += 1
+                    continue
+                self._clock += 1
+                entry[1] = self._clock
+                self._touched.add(key)
+                found[position] = np.array(self._vectors[entry[0]])
+                self.hits += 1
+        return found
+
+    def put_many(self, keys, vectors):
+        """Store vectors (one row per key) and persist; keeps at most max_bytes of vectors"""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if not len(keys):
+            return
+        with self._lock, self._file_lock(exclusive=True):
+            self._refresh()
+            if self._dim is None:
+                self._dim = vectors.shape[1]
+            if vectors.shape[1] != self._dim:
+                raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match cache dimension {self._dim}")
+
+            # Recency from this process's hits, so eviction does not drop rows still in use
+            for key in self._touched:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    self._clock += 1
+                    entry[1] = self._clock
+            self._touched.clear()
+
+            new = [(key, vector) for key, vector in zip(keys, vectors) if key not in self._entries]
+            if not new:
+                return
+            new = new[-self.max_rows:]
+            rows = self._reserve_rows(len(new))
+            for (key, vector), row in zip(new, rows):
+                self._clock += 1
+                self._vectors[row] = vector
+                self._entries[key] = [row, self._clock]
+            self._vectors.flush()
+            self._write_index()
+
+    def _write_index(self):
+        index_path = os.path.join(self.path, INDEX_FILE)
+        tmp_path = f"{index_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({
+                'model': self.model_name,
+                'dim': self._dim,
+                'capacity': self._capacity,
+                'clock': self._clock,
+                'entries': self._entries,
+                'free': self._free
+            }, f)
+        os.replace(tmp_path, index_path)
+        self._index_stamp = self._stamp()
+
+    def __len__(self):
+        return len(self._entries)
@@ -1,9 +1,260 @@
-from sentence_transformers import SentenceTransformer
-from config import EMBEDDING_MODEL
-from sklearn.preprocessing import normalize
+import os
+import re
+import sys
+import time
+import atexit
+import logging
+import threading
+import numpy as np
+from config import (
+    EMBEDDING_MODEL, EMBEDDING_BACKEND, EMBEDDING_CACHE_ENABLED, EMBEDDING_BATCH_SIZE,
+    EMBEDDING_MAX_SEQ_LENGTH, EMBEDDING_POOL_WORKERS, EMBEDDING_INPUT, EMBEDDING_STORAGE, EMBEDDING_MEMMAP_DIR,
+    ONNX_MODEL_DIR, ONNX_QUANTIZE
+)
+from clustering.embedding_cache import EmbeddingCache
+from extraction.entities import page_text
 
-model = SentenceTransformer(EMBEDDING_MODEL)
+logger = logging.getLogger(__name__)
 
-def get_embeddings(texts):
-    raw_embeddings = model.encode([t["text"] for t in texts])
-    return normalize(raw_embeddings)
+_model = None
+_model_lock = threading.Lock()
+_pool = None
+_cache = None
+
+
+def load_torch_model():
+    """Build a SentenceTransformer for EMBEDDING_MODEL"""
+    # sentence_transformers pulls in torch and transformers, so it is only
+    # imported once a document actually needs embedding
+    from sentence_transformers import SentenceTransformer
+    # Keep Streamlit's file watcher from walking torch.classes
+    sys.modules['torch.classes'] = None
+    logger.info("Loading embedding model %s", EMBEDDING_MODEL)
+    model = SentenceTransformer(EMBEDDING_MODEL)
+    if EMBEDDING_MAX_SEQ_LENGTH:
+        model.max_seq_length = EMBEDDING_MAX_SEQ_LENGTH
+    return model
+
+
+def onnx_model_dir():
+    """Export directory for EMBEDDING_MODEL, ONNX_QUANTIZE and EMBEDDING_MAX_SEQ_LENGTH under ONNX_MODEL_DIR"""
+    return os.path.join(ONNX_MODEL_DIR, re.sub(r'[^A-Za-z0-9._-]+', '_', onnx_model_id()))
+
+
+def load_onnx_model():
+    """ONNX Runtime encoder for EMBEDDING_MODEL, exported on first use"""
+    from clustering.onnx_backend import OnnxEncoder, export_onnx_model, onnx_model_exists
+    model_dir = onnx_model_dir()
+    if not onnx_model_exists(model_dir, EMBEDDING_MODEL, ONNX_QUANTIZE, EMBEDDING_MAX_SEQ_LENGTH):
+        export_onnx_model(load_torch_model(), model_dir, quantize=ONNX_QUANTIZE, source_model=EMBEDDING_MODEL)
+    logger.info("Loading ONNX embedding model from %s", model_dir)
+    return OnnxEncoder(model_dir)
+
+
+def load_hash_model():
+    """Weight-free hashing encoder (benchmarks and offline runs only)"""
+    from clustering.hash_backend import HashEncoder
+    return HashEncoder(max_seq_length=EMBEDDING_MAX_SEQ_LENGTH)
+
+
+def get_model():
+    """Process-wide embedding model for EMBEDDING_BACKEND, loaded on first use"""
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                if EMBEDDING_BACKEND == "onnx":
+                    _model = load_onnx_model()
+                elif EMBEDDING_BACKEND == "hash":
+                    _model = load_hash_model()
+                else:
+                    _model = load_torch_model()
+    return _model
+
+
+def _max_length_suffix():
+    # Truncation changes the vectors, so it is part of every model identifier
+    return f"-len{EMBEDDING_MAX_SEQ_LENGTH}" if EMBEDDING_MAX_SEQ_LENGTH else ""
+
+
+def onnx_model_id():
+    """Identifier of the ONNX export of EMBEDDING_MODEL (quantized or not, and its max length)"""
+    return f"{EMBEDDING_MODEL}@onnx{'-int8' if ONNX_QUANTIZE else ''}{_max_length_suffix()}"
+
+
+def model_id():
+    """Identifier of the vectors get_embeddings produces (model, backend and max length)"""
+    if EMBEDDING_BACKEND == "onnx":
+        return onnx_model_id()
+    if EMBEDDING_BACKEND == "hash":
+        return "hash" + _max_length_suffix()
+    return EMBEDDING_MODEL + _max_length_suffix()
+
+
+def get_encode_pool():
+    """Multi-process encode pool when EMBEDDING_POOL_WORKERS > 1, else None
+
+    Only the torch backend uses a pool; ONNX Runtime parallelises within a
+    session instead.
+    """
+    global _pool
+    if EMBEDDING_POOL_WORKERS <= 1 or EMBEDDING_BACKEND != "torch":
+        return None
+    model = get_model()
+    with _model_lock:
+        if _pool is None:
+            _pool = model.start_multi_process_pool(['cpu'] * EMBEDDING_POOL_WORKERS)
+            atexit.register(stop_encode_pool)
+    return _pool
+
+
+def stop_encode_pool():
+    global _pool
+    with _model_lock:
+        if _pool is not None:
+            _model.stop_multi_process_pool(_pool)
+            _pool = None
+
+
+def warm_up():
+    """Load the model (and run one tiny encode) ahead of the first document"""
+    get_model().encode(["warm up"])
+
+
+def get_embedding_cache():
+    """Shared on-disk embedding cache for the configured model, or None if disabled"""
+    global _cache
+    if not EMBEDDING_CACHE_ENABLED:
+        return None
+    if _cache is None:
+        _cache = EmbeddingCache(model_id())
+    return _cache
+
+
+def token_lengths(texts, model=None):
+    """Token count of each text after truncation to the model's max_seq_length"""
+    if model is None:
+        model = get_model()
+    encoded = model.tokenizer(texts, truncation=True, max_length=model.max_seq_length)
+    return [len(ids) for ids in encoded["input_ids"]]
+
+
+def encode_texts(texts, model=None, out=None, rows=None):
+    """Normalized embeddings for a list of strings
+
+    Texts are sorted by token length and encoded in batches of
+    EMBEDDING_BATCH_SIZE, so short pages are not padded to the length of long
+    ones. Each batch is normalized and written straight into out (any float
+    array, e.g. float16 or a memmap; a new float32 array by default), text i
+    at row rows[i] (i by default). Returns out. `model` defaults to the
+    shared get_model() instance.
+    """
+    from sklearn.preprocessing import normalize
+    shared = model is None
+    model = get_model() if shared else model
+    if out is None:
+        out = np.zeros((len(texts), model.get_sentence_embedding_dimension()), dtype=np.float32)
+    if not texts:
+        return out
+    rows = np.arange(len(texts)) if rows is None else np.asarray(rows)
+
+    start = time.perf_counter()
+    lengths = token_lengths(texts, model)
+    order = np.array(sorted(range(len(texts)), key=lambda i: lengths[i], reverse=True))
+    sorted_texts = [texts[i] for i in order]
+
+    pool = get_encode_pool() if shared else None
+    if pool is not None:
+        sorted_embeddings = model.encode_multi_process(sorted_texts, pool, batch_size=EMBEDDING_BATCH_SIZE)
+    for offset in range(0, len(sorted_texts), EMBEDDING_BATCH_SIZE):
+        if pool is not None:
+            batch_embeddings = sorted_embeddings[offset:offset + EMBEDDING_BATCH_SIZE]
+        else:
+            batch = sorted_texts[offset:offset + EMBEDDING_BATCH_SIZE]
+            batch_embeddings = model.encode(batch, batch_size=len(batch), convert_to_numpy=True,
+                                            show_progress_bar=False)
+        out[rows[order[offset:offset + EMBEDDING_BATCH_SIZE]]] = normalize(batch_embeddings)
+
+    elapsed = time.perf_counter() - start
+    total_tokens = sum(lengths)
+    logger.info(
+        "Encoded %d texts, %d tokens in %.1fs (%.0f tokens/sec, batch size %d, max length %d)",
+        len(texts), total_tokens, elapsed, total_tokens / elapsed if elapsed else 0.0,
+        EMBEDDING_BATCH_SIZE, model.max_seq_length
+    )
+    return out
+
+
+def embedding_input(page):
+    """Text encoded for a page: its signature when EMBEDDING_INPUT is "signature" and it has one, else page_text()"""
+    if EMBEDDING_INPUT == "signature":
+        signature = page.get("signature")
+        if signature:
+            return signature
+    return page_text(page)
+
+
+def get_embeddings(texts, cache=None):
+    """Embedding rows for pages; near-duplicates (page["duplicate_of"]) reuse their original's row"""
+    positions = {t["metadata"]["page_num"]: i for i, t in enumerate(texts)}
+    sources = [positions.get(t.get("duplicate_of"), i) for i, t in enumerate(texts)]
+    unique = sorted(set(sources))
+    if len(unique) == len(texts):
+        return _embed_pages(texts, cache)
+    logger.info("Embeddings: %d near-duplicate pages reuse their original's vector", len(texts) - len(unique))
+    embeddings = _embed_pages([texts[position] for position in unique], cache, rows=unique, size=len(texts))
+    duplicates = [position for position, source in enumerate(sources) if source != position]
+    embeddings[duplicates] = embeddings[[sources[position] for position in duplicates]]
+    return embeddings
+
+
+def allocate_embeddings(shape, storage=None):
+    """Empty embeddings array as EMBEDDING_STORAGE: float32, float16 or a float32 memmap"""
+    storage = storage or EMBEDDING_STORAGE
+    if storage == "float16":
+        return np.zeros(shape, dtype=np.float16)
+    if storage == "memmap" and shape[0]:
+        import tempfile
+        # The file is unlinked on creation and freed once the memmap is dropped
+        return np.memmap(tempfile.TemporaryFile(dir=EMBEDDING_MEMMAP_DIR), dtype=np.float32, mode="w+", shape=shape)
+    return np.zeros(shape, dtype=np.float32)
+
+
+def _embed_pages(texts, cache=None, rows=None, size=None):
+    """Embeddings of pages in a new EMBEDDING_STORAGE array of size rows, page i at row rows[i]
+
+    Cached vectors and encoded batches are written straight into the array,
+    so float16 and memmap storage never hold a full float32 copy (only the
+    pages newly encoded for the cache are kept as float32 until stored).
+    """
+    if cache is None:
+        cache = get_embedding_cache()
+    size = len(texts) if size is None else size
+    rows = np.arange(len(texts)) if rows is None else np.asarray(rows)
+    inputs = [embedding_input(t) for t in texts]
+    if cache is None:
+        out = allocate_embeddings((size, get_model().get_sentence_embedding_dimension()))
+        return encode_texts(inputs, out=out, rows=rows)
+
+    keys = [cache.key(text) for text in inputs]
+    found = cache.get_many(keys)
+
+    # Encode each distinct missing text once
+    missing = {}
+    for position, key in enumerate(keys):
+        if position not in found and key not in missing:
+            missing[key] = inputs[position]
+    encoded = None
+    if missing:
+        encoded = encode_texts(list(missing.values()))
+        cache.put_many(list(missing), encoded)
+
+    logger.info("Embeddings: %d of %d pages from cache, %d encoded", len(found), len(texts), len(missing))
+    if not texts:
+        return np.zeros((0, 0), dtype=np.float32)
+    dimension = encoded.shape[1] if encoded is not None else len(next(iter(found.values())))
+    out = allocate_embeddings((size, dimension))
+    encoded_rows = {key: row for row, key in enumerate(missing)}
+    for position, key in enumerate(keys):
+        out[rows[position]] = found[position] if position in found else encoded[encoded_rows[key]]
+    return out
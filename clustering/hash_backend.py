@@ -0,0 +1,42 @@
+import re
+import zlib
+import numpy as np
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+
+class _Tokenizer:
+    """Callable with the subset of the Hugging Face tokenizer API used by encode_texts"""
+
+    def __call__(self, texts, truncation=True, max_length=None):
+        input_ids = []
+        for text in texts:
+            ids = [zlib.crc32(token.encode()) for token in TOKEN_PATTERN.findall(text.lower())]
+            input_ids.append(ids[:max_length] if truncation and max_length else ids)
+        return {"input_ids": input_ids}
+
+
+class HashEncoder:
+    """Weight-free stand-in for SentenceTransformer: signed feature hashing of words
+
+    Pages sharing vocabulary get similar vectors, which is enough to exercise
+    clustering and benchmarks without downloading a model. Not for real use.
+    """
+
+    def __init__(self, dimension=768, max_seq_length=512):
+        self.dimension = dimension
+        self.max_seq_length = max_seq_length
+        self.tokenizer = _Tokenizer()
+
+    def get_sentence_embedding_dimension(self):
+        return self.dimension
+
+    def encode(self, sentences, batch_size=32, convert_to_numpy=True, show_progress_bar=False):
+        embeddings = np.zeros((len(sentences), self.dimension), dtype=np.float32)
+        for row, ids in enumerate(self.tokenizer(sentences, max_length=self.max_seq_length)["input_ids"]):
+            if not ids:
+                continue
+            ids = np.asarray(ids, dtype=np.uint32)
+            signs = np.where(ids & 0x80000000, -1.0, 1.0).astype(np.float32)
+            np.add.at(embeddings[row], ids % self.dimension, signs)
+        return embeddings
@@ -0,0 +1,172 @@
+import os
+import json
+import inspect
+import logging
+import numpy as np
+from config import ONNX_MODEL_DIR, ONNX_THREADS
+
+logger = logging.getLogger(__name__)
+
+MODEL_FILE = "model.onnx"
+QUANTIZED_MODEL_FILE = "model.int8.onnx"
+TOKENIZER_FILE = "tokenizer.json"
+SETTINGS_FILE = "settings.json"
+
+
+def export_onnx_model(model, output_dir=ONNX_MODEL_DIR, quantize=True, source_model=None):
+    """Export a SentenceTransformer's encoder to ONNX (optionally int8-quantized)
+
+    Only the transformer runs in ONNX Runtime; pooling (CLS or mean, read from
+    the SentenceTransformer) is applied in numpy by OnnxEncoder.
+    """
+    import torch
+
+    os.makedirs(output_dir, exist_ok=True)
+    transformer = model[0].auto_model.eval()
+    pooling = model[1]
+    if hasattr(pooling, "get_pooling_mode_str"):
+        pooling_mode = pooling.get_pooling_mode_str()
+    else:
+        pooling_mode = pooling.pooling_mode
+    if pooling_mode not in ("cls", "mean"):
+        raise ValueError(f"Unsupported pooling mode for ONNX export: {pooling_mode}")
+    tokenizer = model.tokenizer
+
+    dummy = tokenizer(["export sample"], return_tensors="pt")
+    input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in dummy]
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+
+    class Encoder(torch.nn.Module):
+        # Named inputs only, so the export does not depend on forward()'s argument order
+        def __init__(self):
+            super().__init__()
+            self.transformer = transformer
+
+        def forward(self, *inputs):
+            return self.transformer(**dict(zip(input_names, inputs)), return_dict=False)[0]
+
+    fp32_path = os.path.join(output_dir, MODEL_FILE)
+    export_kwargs = {}
+    if "dynamo" in inspect.signature(torch.onnx.export).parameters:
+        export_kwargs["dynamo"] = False  # TorchScript exporter handles dynamic axes for BERT-style models
+    with torch.no_grad():
+        torch.onnx.export(
+            Encoder(),
+            tuple(dummy[name] for name in input_names),
+            fp32_path,
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes,
+            opset_version=14,
+            **export_kwargs
+        )
+
+    model_file = MODEL_FILE
+    if quantize:
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+        quantize_dynamic(fp32_path, os.path.join(output_dir, QUANTIZED_MODEL_FILE), weight_type=QuantType.QInt8)
+        model_file = QUANTIZED_MODEL_FILE
+
+    tokenizer.backend_tokenizer.save(os.path.join(output_dir, TOKENIZER_FILE))
+    with open(os.path.join(output_dir, SETTINGS_FILE), 'w') as f:
+        json.dump({
+            "source_model": source_model,
+            "quantized": quantize,
+            "model_file": model_file,
+            "input_names": input_names,
+            "pooling": pooling_mode,
+            "max_seq_length": model.max_seq_length,
+            "dimension": model.get_sentence_embedding_dimension(),
+            "pad_token_id": tokenizer.pad_token_id
+        }, f, indent=2)
+    logger.info("Exported ONNX model to %s (%s)", output_dir, model_file)
+    return output_dir
+
+
+def onnx_model_exists(model_dir=ONNX_MODEL_DIR, source_model=None, quantize=None, max_seq_length=None):
+    """True if model_dir holds an export (of source_model with that quantize flag and max length, when given)"""
+    try:
+        with open(os.path.join(model_dir, SETTINGS_FILE), 'r') as f:
+            settings = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return False
+    if source_model is not None and settings.get("source_model") != source_model:
+        return False
+    if max_seq_length and settings.get("max_seq_length") != max_seq_length:
+        return False
+    return quantize is None or settings.get("quantized") == quantize
+
+
+class _Tokenizer:
+    """Callable with the subset of the Hugging Face tokenizer API used by encode_texts
+
+    Wraps its own untruncated, unpadded tokenizer and truncates the ids in
+    Python, so concurrent calls never reconfigure shared state.
+    """
+
+    def __init__(self, tokenizer):
+        self._tokenizer = tokenizer
+        self._tokenizer.no_padding()
+        self._tokenizer.no_truncation()
+
+    def __call__(self, texts, truncation=True, max_length=None):
+        input_ids = [encoding.ids for encoding in self._tokenizer.encode_batch(texts)]
+        if truncation and max_length:
+            input_ids = [ids[:max_length] for ids in input_ids]
+        return {"input_ids": input_ids}
+
+
+class OnnxEncoder:
+    """ONNX Runtime drop-in for the parts of SentenceTransformer the pipeline uses"""
+
+    def __init__(self, model_dir=ONNX_MODEL_DIR, threads=ONNX_THREADS):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        with open(os.path.join(model_dir, SETTINGS_FILE), 'r') as f:
+            self.settings = json.load(f)
+        self.max_seq_length = self.settings["max_seq_length"]
+        self._input_names = self.settings["input_names"]
+        # Padding and truncation are set once here; the length tokenizer is a separate copy
+        tokenizer_path = os.path.join(model_dir, TOKENIZER_FILE)
+        self._tokenizer = Tokenizer.from_file(tokenizer_path)
+        self._tokenizer.enable_truncation(self.max_seq_length)
+        self._tokenizer.enable_padding(pad_id=self.settings["pad_token_id"] or 0)
+        self.tokenizer = _Tokenizer(Tokenizer.from_file(tokenizer_path))
+
+        options = ort.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(
+            os.path.join(model_dir, self.settings["model_file"]),
+            options,
+            providers=["CPUExecutionProvider"]
+        )
+
+    def get_sentence_embedding_dimension(self):
+        return self.settings["dimension"]
+
+    def _encode_batch(self, texts):
+        encodings = self._tokenizer.encode_batch(texts)
+        feeds = {
+            "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+            "attention_mask": np.array([e.attention_mask for e in encodings], dtype=np.int64),
+            "token_type_ids": np.array([e.type_ids for e in encodings], dtype=np.int64),
+        }
+        hidden = self.session.run(None, {name: feeds[name] for name in self._input_names})[0]
+
+        if self.settings["pooling"] == "cls":
+            return hidden[:, 0]
+        mask = feeds["attention_mask"][..., None].astype(hidden.dtype)
+        return (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+
+    def encode(self, sentences, batch_size=32, convert_to_numpy=True, show_progress_bar=False):
+        if not sentences:
+            return np.zeros((0, self.get_sentence_embedding_dimension()), dtype=np.float32)
+        batches = [
+            self._encode_batch(sentences[offset:offset + batch_size])
+            for offset in range(0, len(sentences), batch_size)
+        ]
+        return np.vstack(batches).astype(np.float32, copy=False)
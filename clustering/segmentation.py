@@ -0,0 +1,38 @@
+import numpy as np
+from config import SEGMENT_SIMILARITY_THRESHOLD, CLUSTERING_BLOCK_SIZE
+from extraction.entities import analyze_page, page_text
+
+def segment_pages(pages, embeddings, threshold=SEGMENT_SIMILARITY_THRESHOLD):
+    """Split the page sequence into contiguous documents in one ordered pass
+
+    A new segment starts when the cosine similarity between a page and the
+    previous page drops below threshold, or when the page carries its own
+    headers and none of them match the headers of the current segment.
+    Pages without headers (continuations) never start a segment on header
+    grounds. Returns one label per page, numbered in page order.
+    """
+    if not pages:
+        return []
+    order = sorted(range(len(pages)), key=lambda i: pages[i]['metadata']['page_num'])
+    # Embeddings are normalized, so the row-wise dot product is the cosine similarity.
+    # Blocks are upcast one at a time, so float16/memmap embeddings are not copied whole.
+    adjacent_similarity = np.empty(len(order) - 1, dtype=np.float32)
+    for start in range(0, len(order) - 1, CLUSTERING_BLOCK_SIZE):
+        block = np.asarray(embeddings[order[start:start + CLUSTERING_BLOCK_SIZE + 1]], dtype=np.float32)
+        adjacent_similarity[start:start + len(block) - 1] = np.einsum('ij,ij->i', block[1:], block[:-1])
+
+    labels = [0] * len(pages)
+    label = 0
+    segment_headers = set()
+    for position, index in enumerate(order):
+        analysis = analyze_page(page_text(pages[index]))
+        headers = set(analysis.headers) if analysis.found_headers else set()
+        if position > 0:
+            header_change = headers and segment_headers and not (headers & segment_headers)
+            if adjacent_similarity[position - 1] < threshold or header_change:
+                label += 1
+                segment_headers = set()
+        if headers:
+            segment_headers = headers
+        labels[index] = label
+    return labels
@@ -9,9 +9,93 @@ EMBEDDING_MODEL = "BAAI/bge-base-en"
 SPACY_MODEL = "en_core_web_lg"
 LAYOUTLMV3_MODEL = "microsoft/layoutlmv3-base"
 
+# Embedding
+EMBEDDING_BACKEND = "torch"  # "torch" (SentenceTransformer), "onnx" (int8 ONNX Runtime, CPU) or "hash" (no weights; benchmarks only)
+ONNX_MODEL_DIR = os.path.join("models", "onnx")  # one export per model and quantize setting, made on first use
+ONNX_QUANTIZE = True
+ONNX_THREADS = 0  # intra-op threads; 0 lets ONNX Runtime decide
+EMBEDDING_BATCH_SIZE = 32  # pages per encode batch (pages are batched by similar token length)
+EMBEDDING_MAX_SEQ_LENGTH = 512  # tokens kept per page; longer pages are truncated
+EMBEDDING_POOL_WORKERS = 0  # >1 encodes on a multi-process pool of that many CPU workers
+# "text" embeds the full page; "signature" embeds a short page signature (top text
+# blocks plus header lines, with banners/footers repeated across pages removed)
+# built from the text layer. Scanned pages always embed their text.
+# Signature mode changes segmentation: on sample_input.pdf (hashing encoder) it
+# cut tokens/page from ~280 to ~36 but merged 2 segments into 1 (ARI 0.0). Check
+# with benchmarks/bench_page_signature.py on the real model before enabling.
+EMBEDDING_INPUT = "text"
+SIGNATURE_TOP_BLOCKS = 3  # leading blocks kept after boilerplate removal
+SIGNATURE_REPEAT_FRACTION = 0.5  # lines on at least this share of pages count as boilerplate
+
+# Memory layout for very large documents
+COMPACT_PAGES = False  # extract into one PageStore (shared text buffer) instead of a dict per page; not with OCR_MODE "bands"
+# "float32", "float16" or "memmap" (float32 temp file). Encoded batches are written straight into the
+# array and clustering upcasts one block at a time, so float16 halves the embeddings' share of peak RSS.
+# memmap pages count in RSS while resident, but the OS can drop them under memory pressure.
+EMBEDDING_STORAGE = "float32"
+EMBEDDING_MEMMAP_DIR = None  # directory for "memmap" files; None uses the system temp directory
+
+# Embedding cache (content-addressed, per model)
+EMBEDDING_CACHE_ENABLED = True
+EMBEDDING_CACHE_DIR = os.path.join("cache", "embeddings")
+EMBEDDING_CACHE_MAX_MB = 512
+
+# OCR (scanned PDFs)
+OCR_WORKERS = os.cpu_count() or 1  # processes rendering + OCRing page chunks
+OCR_CHUNK_SIZE = 4  # pages rendered per task; peak memory ~ OCR_WORKERS x OCR_CHUNK_SIZE page images
+OCR_RENDER_BACKEND = "pymupdf"  # "pymupdf" (in-memory pixmaps) or "poppler" (pdf2image, temporary files)
+OCR_DPI = 200
+OCR_COLOR_MODE = "rgb"  # "rgb", "gray" or "binary" (thresholded 1-bit) page images
+OCR_BATCH_SIZE = 1  # pages per tesseract process (image list file); >1 saves start-up cost, capped by OCR_CHUNK_SIZE
+OCR_LANG = "eng"
+# "full" OCRs whole pages; "bands" OCRs only the header/footer bands up front.
+# Pages whose bands carry a header are embedded and analyzed from the band text;
+# the rest get full-page OCR on first use (see preprocessing/lazy_ocr.py)
+OCR_MODE = "full"
+OCR_HEADER_BAND = 0.15  # fraction of the page height at the top
+OCR_FOOTER_BAND = 0.12  # fraction of the page height at the bottom
+OCR_CONFIG = ""  # extra Tesseract arguments, e.g. "--psm 6"
+
+# OCR cache (SQLite, keyed by page image fingerprint + Tesseract version/lang/config)
+OCR_CACHE_ENABLED = True
+OCR_CACHE_PATH = os.path.join("cache", "ocr.sqlite3")
+OCR_CACHE_MAX_MB = 256
+
+# Near-duplicate pages (MinHash + LSH over word shingles): flagged in the isduplicate
+# column and given their original page's embedding (entities are always read from
+# the page's own text)
+DUPLICATE_DETECTION_ENABLED = True
+DUPLICATE_THRESHOLD = 0.9  # estimated Jaccard similarity of the shingle sets
+DUPLICATE_SHINGLE_SIZE = 5  # words per shingle
+DUPLICATE_NUM_PERM = 128  # MinHash values per page
+DUPLICATE_BANDS = 16  # LSH bands (NUM_PERM / BANDS values per band)
+
 # Clustering
 DBSCAN_EPS = 0.6
 MIN_SAMPLES = 2
+SPARSE_CLUSTERING_MIN_PAGES = 2000  # from this size DBSCAN gets a sparse eps-neighbour graph, not an n x n matrix
+CLUSTERING_BLOCK_SIZE = 1024  # embedding rows upcast and compared at a time (sparse graph tiles, sequential segmentation)
+POSTPROCESS_MAX_GAP = 3  # postprocess_clusters merges clusters at most this many pages apart sharing a header
+
+# Segmentation: "dbscan" (global clustering + postprocess_clusters) or
+# "sequential" (one ordered pass cutting on adjacent-page similarity and header changes)
+SEGMENTATION_METHOD = "dbscan"
+SEGMENT_SIMILARITY_THRESHOLD = 0.75  # adjacent pages less similar than this start a new segment
+
+# Entity extraction
+PAGE_ANALYSIS_CACHE_SIZE = 50000  # distinct page texts kept in memory
+
+# Instrumentation: per-stage wall/CPU time, peak RSS so far and per-page latency
+TRACE_ENABLED = False
+TRACE_OUTPUT = os.path.join("output", "trace.json")
+
+# Local job server (server.py)
+SERVER_HOST = "127.0.0.1"
+SERVER_PORT = 8765
+SERVER_WORKERS = 2  # documents processed concurrently; embedding runs one document at a time
+SERVER_MAX_QUEUED_PAGES = 20000  # pages waiting or running before new jobs get 503
+SERVER_MAX_UPLOAD_MB = 512
+SERVER_MAX_FINISHED_JOBS = 100  # finished jobs (and their results) kept for polling
 
 # CSV Columns (matching your sample)
 CSV_HEADER = [
@@ -0,0 +1,220 @@
+import re
+import hashlib
+import threading
+from collections import OrderedDict, namedtuple
+from datetime import datetime
+from config import PAGE_ANALYSIS_CACHE_SIZE
+from extraction.headers import get_header_matcher
+
+PATIENT_PATTERN = re.compile(
+    r'ABC Name\s*MRN:\s*(\d+).*DOB:\s*([\d/]+).*Legal Sex:\s*(\w)',
+    re.IGNORECASE
+)
+
+PROGRESS_NOTES_PATTERN = re.compile(r'(?i)\bPROGRESS NOTES\b')
+
+# Provider extraction patterns
+PROVIDER_PATTERNS = [re.compile(pattern, re.IGNORECASE | re.MULTILINE) for pattern in [
+    r'^(?:CONSULTANT|PROVIDER|PHYSICIAN|DOCTOR|DR)[:\s]*([Dd][Rr]\.?\s*[A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)',
+    r'^(?:CONSULTANT|PROVIDER|PHYSICIAN|DOCTOR|DR)[:\s]*([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)',
+    r'Referral By\s*([Dd][Rr]\.?\s*[A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)',
+    r'Ref\. By\s*([Dd][Rr]\.?\s*[A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)',
+    r'Ordered By\s*([Dd][Rr]\.?\s*[A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)',
+    r'(?<!\S)(?:Dr\.?|DR\.?)\s*([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)(?!\S)',
+    r'Electronically signed by:\s*([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)',
+    r'Electronically signed by\s*([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)',
+    r'Ordering user:\s*([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)',
+    r'Authorized by:\s*([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)',
+    r'Acknowledged by:\s*([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)',
+    r'Provider\s*([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)',
+    r'ABC\s+([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)',
+    r'Filed by:\s*([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)',
+    r'Resulting lab:\s*([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)',
+    r'Edited by\s*([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)'
+]]
+
+DR_PREFIX_PATTERN = re.compile(r'(?i)\bdr\b\.?')
+FACILITY_PATTERN = re.compile(r'ABC FACILITY')
+
+# Date extraction patterns
+DATE_PATTERNS = [re.compile(pattern) for pattern in [
+    r'Date/Time:\s*([\d/]+)',
+    r'Filed:\s*([\d/]+)',
+    r'Resulted:\s*([\d/]+)',
+    r'Encounter Date:\s*([\d/]+)',
+    r'Electronically signed by.*?(\d{1,2}/\d{1,2}/\d{2,4})',
+    r'Creation Time:\s*(\d{1,2}/\d{1,2}/\d{2,4})'
+]]
+
+DATE_FORMATS = ('%m/%d/%Y', '%m/%d/%y', '%m.%d.%Y', '%Y-%m-%d', '%m/%d')
+
+# Context-free entities of one page. found_headers/found_provider say whether
+# the page itself supplied those values, and date_candidates holds the parsed
+# date (or None when parsing failed) for each date pattern that matched, in
+# pattern order, so that inheritance can be replayed later without the text.
+# dos is always None here: the default date of service is today's date, which
+# must not outlive the day in the cache, so page_dos() resolves it on read.
+PageAnalysis = namedtuple('PageAnalysis', [
+    'dos', 'provider', 'headers', 'patient_info',
+    'found_headers', 'found_provider', 'date_candidates'
+])
+
+
+def today():
+    return datetime.now().strftime("%m/%d/%Y")
+
+
+def _parse_date(date_str):
+    try:
+        token = date_str.split()[0]
+    except IndexError:
+        return None
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(token, fmt).strftime("%m/%d/%Y")
+        except ValueError:
+            continue
+    return None
+
+
+def resolve_dos(date_candidates, dos):
+    """Pick the date of service starting from a default (or inherited) value"""
+    current_day = today()
+    for candidate in date_candidates:
+        if candidate is not None:
+            dos = candidate
+        if dos != current_day:
+            break
+    return dos
+
+
+def page_dos(analysis):
+    """Date of service of an analyzed page, defaulting to today's date"""
+    return resolve_dos(analysis.date_candidates, today())
+
+
+def _analyze(text):
+    patient_info = {
+        'name': '',
+        'mrn': '',
+        'dob': '',
+        'sex': ''
+    }
+
+    # Extract patient information
+    patient_match = PATIENT_PATTERN.search(text)
+    if patient_match:
+        patient_info['mrn'] = patient_match.group(1)
+        patient_info['dob'] = patient_match.group(2)
+        patient_info['sex'] = patient_match.group(3)
+
+    # Check for all header patterns in the text
+    found_headers = get_header_matcher().find_headers(text)
+
+    # If we found multiple headers, prioritize specific ones
+    headers = ["Progress Notes"]
+    if found_headers:
+        if "Progress Notes" in found_headers and len(found_headers) > 1:
+            if not PROGRESS_NOTES_PATTERN.search(text):
+                found_headers.remove("Progress Notes")
+        headers = sorted(found_headers)
+
+    # Extract all provider matches
+    providers = []
+    for pattern in PROVIDER_PATTERNS:
+        for match in pattern.finditer(text):
+            provider_name = match.group(1).strip()
+            if provider_name and len(provider_name.split()) <= 4:
+                if not provider_name.startswith(('Dr.', 'Dr ')):
+                    provider_name = DR_PREFIX_PATTERN.sub('Dr.', provider_name)
+                providers.append(provider_name)
+
+    provider = "Unknown Provider"
+    if providers:
+        provider_counts = {}
+        for p in providers:
+            provider_counts[p] = provider_counts.get(p, 0) + 1
+        provider = max(provider_counts.items(), key=lambda x: x[1])[0]
+
+        if FACILITY_PATTERN.search(text):
+            provider += " - ABC Facility Name"
+
+    # Date extraction
+    date_candidates = []
+    for pattern in DATE_PATTERNS:
+        date_match = pattern.search(text)
+        if date_match:
+            date_candidates.append(_parse_date(date_match.group(1).strip()))
+    date_candidates = tuple(date_candidates)
+
+    return PageAnalysis(
+        dos=None,
+        provider=provider,
+        headers=headers,
+        patient_info=patient_info,
+        found_headers=bool(found_headers),
+        found_provider=bool(providers),
+        date_candidates=date_candidates
+    )
+
+
+class PageAnalysisCache:
+    """LRU cache of PageAnalysis records keyed by a hash of the page text
+
+    The cache is tied to the header matcher it was filled with and empties
+    itself when the header patterns are reloaded.
+    """
+
+    def __init__(self, maxsize=PAGE_ANALYSIS_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._matcher = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(text):
+        return hashlib.blake2b(text.encode('utf-8', 'surrogatepass'), digest_size=16).digest()
+
+    def get(self, text):
+        """Return the PageAnalysis for text, computing it on first use"""
+        key = self.key(text)
+        matcher = get_header_matcher()
+        with self._lock:
+            if matcher is not self._matcher:
+                self._entries.clear()
+                self._matcher = matcher
+            analysis = self._entries.get(key)
+            if analysis is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return analysis
+            self.misses += 1
+
+        analysis = _analyze(text)
+        with self._lock:
+            if matcher is self._matcher:
+                self._entries[key] = analysis
+                if len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+        return analysis
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+page_analysis_cache = PageAnalysisCache()
+
+
+def analyze_page(text):
+    """Context-free entities of a page, computed once per distinct text"""
+    return page_analysis_cache.get(text)
+
+
+def page_text(page):
+    """Text to analyze and embed for a page: page["band_text"] where set (OCR_MODE "bands"), else page["text"]"""
+    return page.get("band_text") or page["text"]
@@ -0,0 +1,163 @@
+import os
+import re
+import json
+import threading
+
+try:
+    from re import _parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_parse
+
+# Path to custom header patterns
+HEADER_PATTERNS_FILE = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'config', 'header_patterns.json')
+
+DEFAULT_HEADER_PATTERNS = [
+    (r'(?i)(?<!given\s)Patient Instructions(?: \(continued\))?', 'Patient Instructions'),
+    (r'(?i)ADMISSION ASSESSMENT', 'Admission Assessment'),
+    (r'(?i)ASSESSMENT/PLAN', 'Clinical Notes'),
+    (r'(?i)CHIEF COMPLAINT', 'Clinical Notes'),
+    (r'(?i)CLINICAL NOTES(?: \(continued\))?', 'Clinical Notes'),
+    (r'(?i)CONSENT FOR (?:ANAESTHESIA|SURGERY)', 'Consent Form'),
+    (r'(?i)DIAGNOSTIC REPORT', 'Diagnostic Report'),
+    (r'(?i)DISCHARGE SUMMARY', 'Discharge Summary'),
+    (r'(?i)FINAL BILL', 'Billing'),
+    (r'(?i)HEMOGLOBIN A1C', 'Laboratory Report'),
+    (r'(?i)INITIAL ASSESSMENT FORM', 'Initial Assessment'),
+    (r'(?i)INTAKE AND OUTPUT RECORD', 'Intake And Output Record'),
+    (r'(?i)IV FLUIDS CHART', 'IV Fluids Chart'),
+    (r'(?i)LABORATORY REPORT', 'Laboratory Report'),
+    (r'(?i)LABS', 'Laboratory Report'),
+    (r'(?i)Labs(?: \(continued\))?', 'Laboratory Report'),
+    (r'(?i)LIPID PANEL', 'Laboratory Report'),
+    (r'(?i)LIPOMA', 'Clinical Notes'),
+    (r'(?i)MEDICINE ORDER SHEET', 'Medication Orders'),
+    (r'(?i)NURSES DAILY RECORD', 'Nursing Notes'),
+    (r'(?i)NURSING ADMISSION ASSESSMENT', 'Admission Assessment'),
+    (r'(?i)Patient Instructions(?: \(continued\))?', 'Patient Instructions'),
+    (r'(?i)PHIMOSIS', 'Clinical Notes'),
+    (r'(?i)PRE OPERATIVE CHECKLIST', 'Pre-Op Checklist'),
+    (r'(?i)PROGRESS NOTES', 'Progress Notes'),
+    (r'(?i)PROGRESS SHEET', 'Progress Notes'),
+    (r'(?i)TEMPERATURE CHART', 'Temperature Chart'),
+    (r'(?i)TSH', 'Laboratory Report'),
+    (r'(?i)UROLOGY PROGRESS NOTE', 'Progress Notes'),
+    (r'(?i)VITAL SIGNS', 'Vital Signs'),
+    (r'(?i)VITAL SIGNS SHEET', 'Vital Signs')
+]
+
+_GIVEN_PATIENT_INSTRUCTIONS = re.compile(r'(?i)\bgiven\s+patient instructions\b')
+
+# Non-ASCII characters that re.IGNORECASE treats as equal to an ASCII letter
+# but that str.lower() leaves alone.
+_CASE_EQUIVALENTS = str.maketrans({'\u0130': 'i', '\u0131': 'i', '\u017f': 's', '\u212a': 'k'})
+
+
+def load_header_patterns():
+    """Load header patterns from JSON file"""
+    try:
+        with open(HEADER_PATTERNS_FILE, 'r') as f:
+            data = json.load(f)
+            return data.get('header_patterns', [])
+    except (FileNotFoundError, json.JSONDecodeError):
+        # Return default patterns if file doesn't exist or is invalid
+        return list(DEFAULT_HEADER_PATTERNS)
+
+
+def save_header_patterns(patterns):
+    """Save header patterns to JSON file"""
+    os.makedirs(os.path.dirname(HEADER_PATTERNS_FILE), exist_ok=True)
+    with open(HEADER_PATTERNS_FILE, 'w') as f:
+        json.dump({'header_patterns': patterns}, f, indent=2)
+    invalidate_header_matcher()
+
+
+def _required_literal(pattern):
+    """Longest lowercase ASCII literal every match of pattern must contain, or None"""
+    try:
+        parsed = sre_parse.parse(pattern, re.IGNORECASE)
+    except re.error:
+        return None
+
+    best = ''
+    run = []
+    for op, arg in list(parsed) + [(None, None)]:
+        if op is sre_parse.LITERAL and arg < 128:
+            run.append(chr(arg))
+            continue
+        if len(run) > len(best):
+            best = ''.join(run)
+        run = []
+    return best.lower() or None
+
+
+class HeaderMatcher:
+    """Compiled header pattern set shared by every caller
+
+    Python's regex engine gains nothing from fusing the patterns into one
+    alternation, so each pattern instead carries the longest literal it
+    requires; a single lowercased copy of the page is checked for those
+    literals and only the surviving patterns run their regex.
+    """
+
+    def __init__(self, patterns):
+        self.patterns = [tuple(p) for p in patterns]
+        self.compiled = [re.compile(pattern, re.IGNORECASE) for pattern, _ in self.patterns]
+        self.names = [header_name for _, header_name in self.patterns]
+        self.literals = [_required_literal(pattern) for pattern, _ in self.patterns]
+
+    @staticmethod
+    def validate(pattern):
+        """Raise re.error if the pattern cannot be compiled"""
+        re.compile(pattern, re.IGNORECASE)
+
+    def find_headers(self, text):
+        """Return the set of header names whose pattern occurs in text"""
+        if not text.isascii():
+            lowered = text.translate(_CASE_EQUIVALENTS).lower()
+        else:
+            lowered = text.lower()
+
+        found = set()
+        for name, compiled, literal in zip(self.names, self.compiled, self.literals):
+            if name in found:
+                continue
+            if literal is not None and literal not in lowered:
+                continue
+            if compiled.search(text):
+                found.add(name)
+
+        # Exclude "Patient Instructions" when preceded by "given"
+        if 'Patient Instructions' in found and _GIVEN_PATIENT_INSTRUCTIONS.search(text):
+            found.discard('Patient Instructions')
+        return found
+
+
+_matcher = None
+_matcher_mtime = None
+_matcher_lock = threading.Lock()
+
+
+def _patterns_mtime():
+    try:
+        return os.stat(HEADER_PATTERNS_FILE).st_mtime_ns
+    except OSError:
+        return None
+
+
+def get_header_matcher():
+    """Return the shared HeaderMatcher, rebuilding it if the JSON file changed"""
+    global _matcher, _matcher_mtime
+    mtime = _patterns_mtime()
+    if _matcher is None or mtime != _matcher_mtime:
+        with _matcher_lock:
+            if _matcher is None or mtime != _matcher_mtime:
+                _matcher = HeaderMatcher(load_header_patterns())
+                _matcher_mtime = mtime
+    return _matcher
+
+
+def invalidate_header_matcher():
+    """Force the next get_header_matcher() call to reload the patterns"""
+    global _matcher
+    with _matcher_lock:
+        _matcher = None
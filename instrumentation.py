@@ -0,0 +1,124 @@
+import sys
+import json
+import time
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def peak_rss_mb(children=False):
+    """Peak resident set size so far of this process (or its finished children) in MB
+
+    ru_maxrss is a high-water mark over the whole process lifetime: a reading
+    taken after a stage is the peak up to that point, not the stage's own peak.
+    """
+    if resource is None:
+        return None
+    who = resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF
+    rss = resource.getrusage(who).ru_maxrss
+    # ru_maxrss is bytes on macOS, kilobytes on Linux
+    return rss / (1024 * 1024) if sys.platform == 'darwin' else rss / 1024
+
+
+class _Stage:
+    def __init__(self, tracer, name, pages):
+        self.tracer = tracer
+        self.record = {'stage': name, 'pages': pages}
+
+    def __enter__(self):
+        self._wall = time.perf_counter()
+        self._cpu = time.process_time()
+        return self.record
+
+    def __exit__(self, exc_type, exc, tb):
+        self.record['wall_seconds'] = round(time.perf_counter() - self._wall, 6)
+        self.record['cpu_seconds'] = round(time.process_time() - self._cpu, 6)
+        self.record['peak_rss_mb'] = peak_rss_mb()
+        self.record['children_peak_rss_mb'] = peak_rss_mb(children=True)
+        if exc_type is not None:
+            self.record['error'] = f"{exc_type.__name__}: {exc}"
+        self.tracer.end_stage(self.record)
+        return False
+
+
+class Tracer:
+    """Records wall/CPU time, peak RSS so far and page counts per pipeline stage
+
+    Use `with tracer.stage("embedding", pages=n) as stage:`; the yielded dict
+    can be updated inside the block (e.g. stage["pages"] = len(pages)).
+    Per-page latencies (OCR, text extraction) go through tracer.page().
+    A stage's peak_rss_mb is the process peak up to the end of that stage, so
+    it shows the stage's own peak only where it rises above earlier stages'.
+    """
+
+    enabled = True
+
+    def __init__(self, document=None):
+        self.document = document
+        self.stages = []
+        self.page_latencies = []
+        self._start = time.perf_counter()
+
+    def stage(self, name, pages=None):
+        return _Stage(self, name, pages)
+
+    def end_stage(self, record):
+        self.stages.append(record)
+
+    def page(self, stage, page_num, seconds):
+        self.page_latencies.append((stage, page_num, seconds))
+
+    def rows(self):
+        """One row per stage for display"""
+        return [{
+            'Stage': s['stage'],
+            'Pages': s['pages'],
+            'Wall (s)': s['wall_seconds'],
+            'CPU (s)': s['cpu_seconds'],
+            'Peak RSS so far (MB)': round(s['peak_rss_mb'], 1) if s['peak_rss_mb'] is not None else None,
+        } for s in self.stages]
+
+    def to_dict(self):
+        latencies = {}
+        for stage, page_num, seconds in self.page_latencies:
+            latencies.setdefault(stage, []).append({'page_num': page_num, 'seconds': round(seconds, 6)})
+        return {
+            'document': self.document,
+            'total_wall_seconds': round(time.perf_counter() - self._start, 6),
+            'stages': self.stages,
+            'page_latencies': latencies
+        }
+
+    def write_json(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+
+class _NullStage:
+    def __enter__(self):
+        return {}
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+class NullTracer:
+    """Tracer stand-in that records nothing (the default)"""
+
+    enabled = False
+    stages = ()
+    page_latencies = ()
+
+    def stage(self, name, pages=None):
+        return _NULL_STAGE
+
+    def page(self, stage, page_num, seconds):
+        pass
+
+
+NULL_TRACER = NullTracer()
@@ -0,0 +1,109 @@
+"""Client for the local job server (server.py)
+
+Run from the repository root while the server is up:
+
+    python job_client.py record.pdf --output output/record.csv
+    python job_client.py record.pdf --server http://127.0.0.1:8765 --segmentation sequential
+
+Submits the PDF, waits for the job (retrying while the server reports a full
+queue) and writes the result in the format implied by --output.
+"""
+import os
+import json
+import time
+import argparse
+import urllib.error
+import urllib.request
+from urllib.parse import urlencode
+from config import SERVER_HOST, SERVER_PORT
+
+SERVER_URL = f"http://{SERVER_HOST}:{SERVER_PORT}"
+
+
+class JobFailed(Exception):
+    pass
+
+
+def _request(url, data=None, method=None, headers=None):
+    request = urllib.request.Request(url, data=data, method=method, headers=headers or {})
+    with urllib.request.urlopen(request) as response:
+        return response.read()
+
+
+def submit_pdf(pdf, server=SERVER_URL, name=None, segmentation=None, retry_seconds=None):
+    """Submit a PDF (path or bytes) and return the job id
+
+    While the server answers 503 (queued-page limit reached) the submission is
+    retried for up to retry_seconds; None fails immediately.
+    """
+    if isinstance(pdf, (bytes, bytearray)):
+        data = bytes(pdf)
+    else:
+        with open(pdf, 'rb') as f:
+            data = f.read()
+        name = name or os.path.basename(pdf)
+    params = {key: value for key, value in (("name", name), ("segmentation", segmentation)) if value}
+    url = f"{server}/jobs" + (f"?{urlencode(params)}" if params else "")
+
+    deadline = time.monotonic() + (retry_seconds or 0)
+    while True:
+        try:
+            body = _request(url, data, "POST", {"Content-Type": "application/pdf"})
+            return json.loads(body)["job_id"]
+        except urllib.error.HTTPError as e:
+            if e.code != 503 or time.monotonic() >= deadline:
+                raise
+            time.sleep(min(float(e.headers.get("Retry-After") or 5), max(deadline - time.monotonic(), 0.1)))
+
+
+def job_status(job_id, server=SERVER_URL):
+    return json.loads(_request(f"{server}/jobs/{job_id}"))
+
+
+def job_result(job_id, server=SERVER_URL, output_format="json"):
+    """Rows (json) or the encoded file contents (csv, jsonl, parquet) of a finished job"""
+    body = _request(f"{server}/jobs/{job_id}/result?format={output_format}")
+    return json.loads(body)["rows"] if output_format == "json" else body
+
+
+def wait_for_job(job_id, server=SERVER_URL, poll_interval=1.0, timeout=None):
+    """Poll until the job is done; returns its status, raises JobFailed if it failed"""
+    deadline = time.monotonic() + timeout if timeout else None
+    while True:
+        status = job_status(job_id, server)
+        if status["status"] == "done":
+            return status
+        if status["status"] == "failed":
+            raise JobFailed(status["error"])
+        if deadline and time.monotonic() > deadline:
+            raise TimeoutError(f"Job {job_id} still {status['status']} after {timeout}s")
+        time.sleep(poll_interval)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("pdf")
+    parser.add_argument("--server", default=SERVER_URL)
+    parser.add_argument("--output", required=True, help="Result file (.csv, .jsonl or .parquet)")
+    parser.add_argument("--segmentation", choices=["dbscan", "sequential"], default=None)
+    parser.add_argument("--retry-seconds", type=float, default=600, help="How long to retry while the queue is full")
+    args = parser.parse_args()
+
+    job_id = submit_pdf(args.pdf, args.server, segmentation=args.segmentation, retry_seconds=args.retry_seconds)
+    print(f"Submitted {args.pdf} as job {job_id}")
+    try:
+        status = wait_for_job(job_id, args.server)
+    except JobFailed as e:
+        print(f"Job {job_id} failed: {e}")
+        raise SystemExit(1)
+
+    extension = os.path.splitext(args.output)[1].lower().lstrip(".")
+    output_format = extension if extension in ("csv", "jsonl", "parquet") else "csv"
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, 'wb') as f:
+        f.write(job_result(job_id, args.server, output_format))
+    print(f"{status['pages']} pages, {status['rows']} rows written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
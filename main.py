@@ -1,21 +1,17 @@
 import os
-import csv
-import re
-import json
+import logging
+import heapq
+import argparse
 from datetime import datetime
 from collections import defaultdict
 from config import *
-from preprocessing.pdf_detector import is_scanned
-from preprocessing.digital_pdf import extract_digital_pages
-from preprocessing.scanned_pdf import extract_scanned_pages
+from preprocessing.hybrid_pdf import extract_pages
 from clustering.embeddings import get_embeddings
 from clustering.clustering import cluster_pages
-
-import sys
-sys.modules['torch.classes'] = None
-
-# Path to custom header patterns
-HEADER_PATTERNS_FILE = os.path.join(os.path.dirname(__file__), 'config', 'header_patterns.json')
+from clustering.segmentation import segment_pages
+from extraction.entities import analyze_page, page_dos, page_text, resolve_dos
+from instrumentation import Tracer, NULL_TRACER
+from output_writers import WRITERS, open_writer, path_for_format
 
 class DocumentContext:
     """Track context across pages for metadata inheritance"""
@@ -51,78 +47,12 @@ class DocumentContext:
             }
         return None
 
-def load_header_patterns():
-    """Load header patterns from JSON file"""
-    try:
-        with open(HEADER_PATTERNS_FILE, 'r') as f:
-            data = json.load(f)
-            return data.get('header_patterns', [])
-    except (FileNotFoundError, json.JSONDecodeError):
-        # Return default patterns if file doesn't exist or is invalid
-        return [
-            (r'(?i)(?<!given\s)Patient Instructions(?: \(continued\))?', 'Patient Instructions'),
-            (r'(?i)ADMISSION ASSESSMENT', 'Admission Assessment'),
-            (r'(?i)ASSESSMENT/PLAN', 'Clinical Notes'),
-            (r'(?i)CHIEF COMPLAINT', 'Clinical Notes'),
-            (r'(?i)CLINICAL NOTES(?: \(continued\))?', 'Clinical Notes'),
-            (r'(?i)CONSENT FOR (?:ANAESTHESIA|SURGERY)', 'Consent Form'),
-            (r'(?i)DIAGNOSTIC REPORT', 'Diagnostic Report'),
-            (r'(?i)DISCHARGE SUMMARY', 'Discharge Summary'),
-            (r'(?i)FINAL BILL', 'Billing'),
-            (r'(?i)HEMOGLOBIN A1C', 'Laboratory Report'),
-            (r'(?i)INITIAL ASSESSMENT FORM', 'Initial Assessment'),
-            (r'(?i)INTAKE AND OUTPUT RECORD', 'Intake And Output Record'),
-            (r'(?i)IV FLUIDS CHART', 'IV Fluids Chart'),
-            (r'(?i)LABORATORY REPORT', 'Laboratory Report'),
-            (r'(?i)LABS', 'Laboratory Report'),
-            (r'(?i)Labs(?: \(continued\))?', 'Laboratory Report'),
-            (r'(?i)LIPID PANEL', 'Laboratory Report'),
-            (r'(?i)LIPOMA', 'Clinical Notes'),
-            (r'(?i)MEDICINE ORDER SHEET', 'Medication Orders'),
-            (r'(?i)NURSES DAILY RECORD', 'Nursing Notes'),
-            (r'(?i)NURSING ADMISSION ASSESSMENT', 'Admission Assessment'),
-            (r'(?i)Patient Instructions(?: \(continued\))?', 'Patient Instructions'),
-            (r'(?i)PHIMOSIS', 'Clinical Notes'),
-            (r'(?i)PRE OPERATIVE CHECKLIST', 'Pre-Op Checklist'),
-            (r'(?i)PROGRESS NOTES', 'Progress Notes'),
-            (r'(?i)PROGRESS SHEET', 'Progress Notes'),
-            (r'(?i)TEMPERATURE CHART', 'Temperature Chart'),
-            (r'(?i)TSH', 'Laboratory Report'),
-            (r'(?i)UROLOGY PROGRESS NOTE', 'Progress Notes'),
-            (r'(?i)VITAL SIGNS', 'Vital Signs'),
-            (r'(?i)VITAL SIGNS SHEET', 'Vital Signs')
-        ]
-
-def save_header_patterns(patterns):
-    """Save header patterns to JSON file"""
-    os.makedirs(os.path.dirname(HEADER_PATTERNS_FILE), exist_ok=True)
-    with open(HEADER_PATTERNS_FILE, 'w') as f:
-        json.dump({'header_patterns': patterns}, f, indent=2)
-
-def extract_entities(text, context=None, page_num=None):
-    """Enhanced entity extraction with context awareness"""
-    # Initialize default values
-    headers = ["Progress Notes"]
-    patient_info = {
-        'name': '',
-        'mrn': '',
-        'dob': '',
-        'sex': ''
-    }
-    
-    provider = "Unknown Provider"
-    dos = datetime.now().strftime("%m/%d/%Y")
-
-    # Extract patient information
-    patient_match = re.search(
-        r'ABC Name\s*MRN:\s*(\d+).*DOB:\s*([\d/]+).*Legal Sex:\s*(\w)',
-        text, 
-        re.IGNORECASE
-    )
-    if patient_match:
-        patient_info['mrn'] = patient_match.group(1)
-        patient_info['dob'] = patient_match.group(2)
-        patient_info['sex'] = patient_match.group(3)
+def inherit_metadata(analysis, context=None, page_num=None):
+    """Apply context-aware inheritance to a cached PageAnalysis"""
+    dos = page_dos(analysis)
+    provider = analysis.provider
+    headers = list(analysis.headers)
+    patient_info = dict(analysis.patient_info)
 
     # Check for inherited metadata if current page has missing info
     if context and page_num:
@@ -130,109 +60,20 @@ def extract_entities(text, context=None, page_num=None):
         if inherited:
             if not patient_info.get('mrn') and inherited['patient_info'].get('mrn'):
                 patient_info = inherited['patient_info']
-            if dos == datetime.now().strftime("%m/%d/%Y") and inherited['dos']:
-                dos = inherited['dos']
-            if provider == "Unknown Provider" and inherited['provider']:
+            if inherited['dos']:
+                dos = resolve_dos(analysis.date_candidates, inherited['dos'])
+            if not analysis.found_provider and inherited['provider']:
                 provider = inherited['provider']
-            if headers == ["Progress Notes"] and inherited['header']:
+            if not analysis.found_headers and inherited['header']:
                 headers = [inherited['header']]
 
-    # Load header patterns
-    header_patterns = load_header_patterns()
-
-    # Check for all header patterns in the text
-    found_headers = set()
-    for pattern, header_name in header_patterns:
-        # Special handling for Patient Instructions to exclude when preceded by "given"
-        if header_name == "Patient Instructions":
-            if re.search(r'(?i)\bgiven\s+patient instructions\b', text):
-                continue
-        
-        if re.search(pattern, text, re.IGNORECASE):
-            found_headers.add(header_name)
-    
-    # If we found multiple headers, prioritize specific ones
-    if found_headers:
-        if "Progress Notes" in found_headers and len(found_headers) > 1:
-            if not re.search(r'(?i)\bPROGRESS NOTES\b', text):
-                found_headers.remove("Progress Notes")
-        
-        if "Clinical Notes" in found_headers and "Progress Notes" in found_headers:
-            pass
-        
-        headers = sorted(list(found_headers))
-
-    # Provider extraction patterns
-    provider_patterns = [
-        r'^(?:CONSULTANT|PROVIDER|PHYSICIAN|DOCTOR|DR)[:\s]*([Dd][Rr]\.?\s*[A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)',
-        r'^(?:CONSULTANT|PROVIDER|PHYSICIAN|DOCTOR|DR)[:\s]*([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)',
-        r'Referral By\s*([Dd][Rr]\.?\s*[A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)',
-        r'Ref\. By\s*([Dd][Rr]\.?\s*[A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)',
-        r'Ordered By\s*([Dd][Rr]\.?\s*[A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)',
-        r'(?<!\S)(?:Dr\.?|DR\.?)\s*([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)(?!\S)',
-        r'Electronically signed by:\s*([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)',
-        r'Electronically signed by\s*([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)',
-        r'Ordering user:\s*([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)',
-        r'Authorized by:\s*([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)',
-        r'Acknowledged by:\s*([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)',
-        r'Provider\s*([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)',
-        r'ABC\s+([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)',
-        r'Filed by:\s*([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)',
-        r'Resulting lab:\s*([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)',
-        r'Edited by\s*([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)'
-    ]
-
-    # Extract all provider matches
-    providers = []
-    for pattern in provider_patterns:
-        provider_matches = re.finditer(pattern, text, re.IGNORECASE | re.MULTILINE)
-        for match in provider_matches:
-            provider_name = match.group(1).strip()
-            if provider_name and len(provider_name.split()) <= 4:
-                if not provider_name.startswith(('Dr.', 'Dr ')):
-                    provider_name = re.sub(r'(?i)\bdr\b\.?', 'Dr.', provider_name)
-                providers.append(provider_name)
-    
-    if providers:
-        provider_counts = {}
-        for p in providers:
-            provider_counts[p] = provider_counts.get(p, 0) + 1
-        provider = max(provider_counts.items(), key=lambda x: x[1])[0]
-        
-        facility_match = re.search(r'ABC FACILITY', text)
-        if facility_match:
-            provider += " - ABC Facility Name"
-
-    # Date extraction
-    date_patterns = [
-        r'Date/Time:\s*([\d/]+)',
-        r'Filed:\s*([\d/]+)',
-        r'Resulted:\s*([\d/]+)',
-        r'Encounter Date:\s*([\d/]+)',
-        r'Electronically signed by.*?(\d{1,2}/\d{1,2}/\d{2,4})',
-        r'Creation Time:\s*(\d{1,2}/\d{1,2}/\d{2,4})'
-    ]
-
-    for pattern in date_patterns:
-        date_match = re.search(pattern, text)
-        if date_match:
-            date_str = date_match.group(1).strip()
-            try:
-                for fmt in ('%m/%d/%Y', '%m/%d/%y', '%m.%d.%Y', '%Y-%m-%d', '%m/%d'):
-                    try:
-                        parsed_date = datetime.strptime(date_str.split()[0], fmt)
-                        dos = parsed_date.strftime("%m/%d/%Y")
-                        break
-                    except:
-                        continue
-            except:
-                pass
-            if dos != datetime.now().strftime("%m/%d/%Y"):
-                break
-
     return dos, provider, headers, patient_info
 
-def postprocess_clusters(pages, labels):
+def extract_entities(text, context=None, page_num=None):
+    """Enhanced entity extraction with context awareness"""
+    return inherit_metadata(analyze_page(text), context, page_num)
+
+def postprocess_clusters(pages, labels, max_gap=POSTPROCESS_MAX_GAP):
     """Apply rule-based corrections to clustering results"""
     clusters = defaultdict(list)
     for page, label in zip(pages, labels):
@@ -251,9 +92,9 @@ def postprocess_clusters(pages, labels):
         last_page = current_cluster[-1]['metadata']['page_num']
         first_page = cluster_pages[0]['metadata']['page_num']
         
-        if (first_page - last_page <= 3):
-            last_headers = extract_entities(current_cluster[-1]['text'])[2]
-            current_headers = extract_entities(cluster_pages[0]['text'])[2]
+        if (first_page - last_page <= max_gap):
+            last_headers = analyze_page(page_text(current_cluster[-1])).headers
+            current_headers = analyze_page(page_text(cluster_pages[0])).headers
             
             if set(last_headers) & set(current_headers):
                 current_cluster.extend(cluster_pages)
@@ -276,9 +117,15 @@ def postprocess_clusters(pages, labels):
     
     return new_labels
 
-def generate_output(pages, labels):
-    os.makedirs("output", exist_ok=True)
-    
+def generate_output(pages, labels, output_path=OUTPUT_CSV, output_format=None, return_rows=True):
+    """Stream the output rows to output_path and return them
+
+    output_path may be a path, an open file object or None (no file). The
+    format (csv, jsonl, parquet) is taken from output_format or the path's
+    extension. Rows are written in (page_num, header_type) order as soon as no
+    later cluster can contain an earlier page, so only rows still waiting on
+    an earlier page are held. Pass return_rows=False to keep nothing.
+    """
     category_map = {
         'Admission Assessment': 26,
         'Billing': 25,
@@ -307,94 +154,126 @@ def generate_output(pages, labels):
     }
     
     context = DocumentContext()
-    output_data = []
-    current_parent = 0
+    collected = []
+    pending = []  # heap of (page_num, header_type, sequence, row) not yet written
+    sequence = 0
     
-    sorted_pages = sorted(pages, key=lambda x: x['metadata']['page_num'])
+    # Single grouping pass over (page, label) pairs in page order
+    clusters = defaultdict(list)
+    for page, label in sorted(zip(pages, labels), key=lambda x: x[0]['metadata']['page_num']):
+        clusters[label].append(page)
     
-    for cluster_id in sorted(set(labels)):
-        cluster_pages = [p for p in sorted_pages if labels[pages.index(p)] == cluster_id]
-        cluster_pages.sort(key=lambda x: x['metadata']['page_num'])
-        
-        for i, page in enumerate(cluster_pages):
-            page_num = page['metadata']['page_num']
-            dos, provider, headers, patient_info = extract_entities(
-                page["text"], context, page_num
-            )
-            
-            context.update_context(page_num, dos, provider, headers[0] if headers else "Progress Notes", patient_info)
+    cluster_ids = sorted(clusters)
+    # Lowest first page among the clusters after each position; rows below it are final
+    flush_bounds = [float('inf')] * (len(cluster_ids) + 1)
+    for position in range(len(cluster_ids) - 1, -1, -1):
+        first_page = clusters[cluster_ids[position]][0]['metadata']['page_num']
+        flush_bounds[position] = min(first_page, flush_bounds[position + 1])
+    
+    writer = open_writer(output_path, output_format) if output_path is not None else None
+    try:
+        for position, cluster_id in enumerate(cluster_ids):
+            cluster_pages = clusters[cluster_id]
             
-            for header in headers:
-                category_id = category_map.get(header, 17)
-                
-                header_parts = []
-                if patient_info.get('name'):
-                    header_parts.append(patient_info['name'])
-                header_parts.append(header)
-                if patient_info.get('mrn'):
-                    header_parts.append(f"MRN: {patient_info['mrn']}")
+            for page in cluster_pages:
+                page_num = page['metadata']['page_num']
+                # Near-duplicates keep their own DOS/provider; identical text hits the analysis cache
+                dos, provider, headers, patient_info = extract_entities(
+                    page_text(page), context, page_num
+                )
                 
-                full_header = " - ".join(header_parts)
+                context.update_context(page_num, dos, provider, headers[0] if headers else "Progress Notes", patient_info)
                 
-                output_data.append({
-                    'page_num': page_num,
-                    'category_id': category_id,
-                    'dos': dos,
-                    'provider': provider,
-                    'reference_key': f"12099{page_num}",
-                    'parent_key': f"12099{current_parent}" if i > 0 else "0",
-                    'header': full_header,
-                    'cluster_order': i,
-                    'parent_marker': current_parent if i == 0 else None,
-                    'header_type': header
-                })
+                for header in headers:
+                    category_id = category_map.get(header, 17)
+                    
+                    header_parts = []
+                    if patient_info.get('name'):
+                        header_parts.append(patient_info['name'])
+                    header_parts.append(header)
+                    if patient_info.get('mrn'):
+                        header_parts.append(f"MRN: {patient_info['mrn']}")
+                    
+                    full_header = " - ".join(header_parts)
+                    
+                    # The parent lookup has always resolved to no parent, so
+                    # parentkey stays "0" for every row
+                    row = [
+                        page_num,
+                        category_id,
+                        "TRUE",
+                        dos,
+                        provider,
+                        f"12099{page_num}",
+                        "0",
+                        "L",
+                        full_header,
+                        "",
+                        "287",
+                        "322",
+                        "TRUE" if 'duplicate_of' in page else "FALSE"
+                    ]
+                    heapq.heappush(pending, (page_num, header, sequence, row))
+                    sequence += 1
             
-            if i == 0:
-                current_parent = page_num
-    
-    output_data.sort(key=lambda x: (x['page_num'], x['header_type']))
+            ready = []
+            while pending and pending[0][0] < flush_bounds[position + 1]:
+                ready.append(heapq.heappop(pending)[3])
+            if writer is not None:
+                writer.write_rows(ready)
+            if return_rows:
+                collected.extend(ready)
+    finally:
+        if writer is not None:
+            writer.close()
     
-    with open(OUTPUT_CSV, 'w', newline='') as f:
-        writer = csv.writer(f)
-        writer.writerow(CSV_HEADER)
-        
-        parent_map = {item['page_num']: item for item in output_data if item['parent_marker'] is not None}
-        
-        for item in output_data:
-            parent_key = "0"
-            if item['cluster_order'] > 0:
-                parent = parent_map.get(item['parent_marker'])
-                parent_key = f"12099{parent['page_num']}" if parent else "0"
-            
-            writer.writerow([
-                item['page_num'],
-                item['category_id'],
-                "TRUE",
-                item['dos'],
-                item['provider'],
-                item['reference_key'],
-                parent_key,
-                "L",
-                item['header'],
-                "",
-                "287",
-                "322",
-                "FALSE"
-            ])
+    return collected if return_rows else None
 
-if __name__ == "__main__":
-    if is_scanned(INPUT_PDF):
-        pages = extract_scanned_pages(INPUT_PDF)
-    else:
-        pages = extract_digital_pages(INPUT_PDF)
-    
-    embeddings = get_embeddings(pages)
-    labels = cluster_pages(embeddings)
+def assign_labels(pages, embeddings, method=SEGMENTATION_METHOD, tracer=NULL_TRACER):
+    """Group pages into documents with DBSCAN + postprocessing or sequential segmentation"""
+    if method == "sequential":
+        with tracer.stage("segmentation", pages=len(pages)):
+            return segment_pages(pages, embeddings)
+    with tracer.stage("clustering", pages=len(pages)):
+        labels = cluster_pages(embeddings)
+    with tracer.stage("postprocessing", pages=len(pages)):
+        return postprocess_clusters(pages, labels)
+
+def process_pdf(pdf_path, output_path=OUTPUT_CSV, method=SEGMENTATION_METHOD, tracer=NULL_TRACER, output_format=None):
+    """Run the full pipeline on one PDF and write its output (CSV unless output_format/extension say otherwise)"""
+    pages = extract_pages(pdf_path, tracer=tracer)
     
-    labels = postprocess_clusters(pages, labels)
+    with tracer.stage("embedding", pages=len(pages)):
+        embeddings = get_embeddings(pages)
+    labels = assign_labels(pages, embeddings, method, tracer)
     
-    generate_output(pages, labels)
-    print(f"Output generated at {OUTPUT_CSV}")
+    with tracer.stage("output", pages=len(pages)):
+        generate_output(pages, labels, output_path, output_format, return_rows=False)
+    return pages, labels
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cluster the pages of a medical record PDF and write the CSV index")
+    parser.add_argument("--input", default=INPUT_PDF, help=f"PDF to process (default: {INPUT_PDF})")
+    parser.add_argument("--output", default=OUTPUT_CSV, help=f"Output file to write (default: {OUTPUT_CSV})")
+    parser.add_argument("--format", choices=sorted(WRITERS), default=None,
+                        help="Output format (default: from the --output extension, else csv); "
+                             "the --output extension is changed to match")
+    parser.add_argument("--segmentation", choices=["dbscan", "sequential"], default=SEGMENTATION_METHOD,
+                        help=f"How pages are grouped into documents (default: {SEGMENTATION_METHOD})")
+    parser.add_argument("--trace", nargs="?", const=TRACE_OUTPUT, default=TRACE_OUTPUT if TRACE_ENABLED else None,
+                        help=f"Write a per-stage timing trace as JSON (default path: {TRACE_OUTPUT})")
+    args = parser.parse_args()
 
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
 
-    
\ No newline at end of file
+    if args.format:
+        args.output = path_for_format(args.output, args.format)
+    tracer = Tracer(args.input) if args.trace else NULL_TRACER
+    process_pdf(args.input, args.output, args.segmentation, tracer, args.format)
+    print(f"Output generated at {args.output}")
+    if args.trace:
+        os.makedirs(os.path.dirname(args.trace) or ".", exist_ok=True)
+        tracer.write_json(args.trace)
+        for row in tracer.rows():
+            print("  ".join(f"{key}: {value}" for key, value in row.items()))
+        print(f"Trace written to {args.trace}")
@@ -0,0 +1,137 @@
+import os
+import csv
+import json
+from config import CSV_HEADER
+
+# Columns holding integers; everything else is written as text
+INTEGER_COLUMNS = ("pagenumber", "category")
+
+
+class OutputWriter:
+    """Streams output rows (lists in CSV_HEADER order) to a path or an open file object
+
+    Paths are opened (and closed) by the writer; file objects are left open.
+    Use as a context manager, or call close().
+    """
+
+    binary = False
+
+    def __init__(self, target, columns=CSV_HEADER):
+        self.columns = list(columns)
+        self._owned = isinstance(target, (str, os.PathLike))
+        if self._owned:
+            os.makedirs(os.path.dirname(target) or ".", exist_ok=True)
+            if self.binary:
+                self.file = open(target, 'wb')
+            else:
+                self.file = open(target, 'w', newline='', encoding='utf-8')
+        else:
+            self.file = target
+
+    def write_rows(self, rows):
+        raise NotImplementedError
+
+    def close(self):
+        if self._owned:
+            self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+class CsvWriter(OutputWriter):
+    def __init__(self, target, columns=CSV_HEADER):
+        super().__init__(target, columns)
+        self._writer = csv.writer(self.file)
+        self._writer.writerow(self.columns)
+
+    def write_rows(self, rows):
+        self._writer.writerows(rows)
+
+
+class JsonlWriter(OutputWriter):
+    """One JSON object per row, keyed by column name (for the ingestion service)"""
+
+    def write_rows(self, rows):
+        self.file.writelines(json.dumps(dict(zip(self.columns, row))) + "\n" for row in rows)
+
+
+class ParquetWriter(OutputWriter):
+    """Columnar output via pyarrow; rows are buffered and written as row groups"""
+
+    binary = True
+
+    def __init__(self, target, columns=CSV_HEADER, row_group_size=10000):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        super().__init__(target, columns)
+        self._pa = pa
+        self.schema = pa.schema([
+            (name, pa.int64() if name in INTEGER_COLUMNS else pa.string()) for name in self.columns
+        ])
+        self._writer = pq.ParquetWriter(self.file, self.schema)
+        self.row_group_size = row_group_size
+        self._buffer = []
+
+    def write_rows(self, rows):
+        self._buffer.extend(rows)
+        if len(self._buffer) >= self.row_group_size:
+            self._flush()
+
+    def _flush(self):
+        if not self._buffer:
+            return
+        arrays = []
+        for field, values in zip(self.schema, zip(*self._buffer)):
+            if field.name not in INTEGER_COLUMNS:
+                values = [None if value is None else str(value) for value in values]
+            arrays.append(self._pa.array(values, type=field.type))
+        self._writer.write_table(self._pa.Table.from_arrays(arrays, schema=self.schema))
+        self._buffer = []
+
+    def close(self):
+        self._flush()
+        self._writer.close()
+        super().close()
+
+
+WRITERS = {
+    "csv": CsvWriter,
+    "jsonl": JsonlWriter,
+    "parquet": ParquetWriter,
+}
+
+EXTENSIONS = {
+    ".csv": "csv",
+    ".jsonl": "jsonl",
+    ".json": "jsonl",
+    ".parquet": "parquet",
+}
+
+
+def output_format_for(target, output_format=None):
+    """Explicit format, else the one implied by a path's extension, else csv"""
+    if output_format:
+        if output_format not in WRITERS:
+            raise ValueError(f"Unknown output format {output_format!r}; expected one of {', '.join(WRITERS)}")
+        return output_format
+    if isinstance(target, (str, os.PathLike)):
+        return EXTENSIONS.get(os.path.splitext(target)[1].lower(), "csv")
+    return "csv"
+
+
+def path_for_format(path, output_format):
+    """path, with its extension replaced by output_format's if it implies another format"""
+    root, extension = os.path.splitext(path)
+    if EXTENSIONS.get(extension.lower()) == output_format:
+        return path
+    return root + "." + output_format
+
+
+def open_writer(target, output_format=None, columns=CSV_HEADER):
+    """Writer for target (a path or file object) in the given or inferred format"""
+    return WRITERS[output_format_for(target, output_format)](target, columns)
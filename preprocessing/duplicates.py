@@ -0,0 +1,87 @@
+import re
+import zlib
+import logging
+import numpy as np
+from config import DUPLICATE_THRESHOLD, DUPLICATE_SHINGLE_SIZE, DUPLICATE_NUM_PERM, DUPLICATE_BANDS
+
+logger = logging.getLogger(__name__)
+
+_WORD = re.compile(r'\w+')
+# Mersenne prime for the universal hash family; shingle hashes are reduced below it
+_PRIME = np.uint64((1 << 31) - 1)
+
+
+def shingles(text, size=DUPLICATE_SHINGLE_SIZE):
+    """crc32 hashes of the page's overlapping word n-grams (lowercased)"""
+    words = _WORD.findall(text.lower())
+    if len(words) < size:
+        grams = [' '.join(words)] if words else []
+    else:
+        grams = [' '.join(words[i:i + size]) for i in range(len(words) - size + 1)]
+    return np.unique(np.fromiter((zlib.crc32(gram.encode()) for gram in grams), dtype=np.uint64, count=len(grams)))
+
+
+class MinHasher:
+    """MinHash signatures of shingle sets with num_perm hash functions (a * x + b) mod p"""
+
+    def __init__(self, num_perm=DUPLICATE_NUM_PERM, seed=1):
+        rng = np.random.default_rng(seed)
+        self.a = rng.integers(1, int(_PRIME), size=(num_perm, 1), dtype=np.uint64)
+        self.b = rng.integers(0, int(_PRIME), size=(num_perm, 1), dtype=np.uint64)
+
+    def signature(self, hashes):
+        # a, b and x are below 2**31, so a * x + b fits in 64 bits
+        return ((self.a * (hashes % _PRIME) + self.b) % _PRIME).min(axis=1)
+
+
+def find_duplicates(texts, threshold=DUPLICATE_THRESHOLD, num_perm=DUPLICATE_NUM_PERM, bands=DUPLICATE_BANDS):
+    """Map the index of each near-duplicate text to the index of its first occurrence
+
+    Pages are hashed into LSH buckets band by band, so only pages sharing a
+    bucket are compared; a pair counts when the share of equal MinHash values
+    (the estimated Jaccard similarity of their shingle sets) reaches threshold.
+    Only first occurrences are indexed, so every duplicate maps to one
+    original. Texts without words are never duplicates.
+    """
+    minhasher = MinHasher(num_perm)
+    rows = num_perm // bands
+    buckets = {}
+    signatures = {}
+    duplicates = {}
+    for index, text in enumerate(texts):
+        hashes = shingles(text)
+        if not len(hashes):
+            continue
+        signature = minhasher.signature(hashes)
+        keys = [(band, signature[band * rows:(band + 1) * rows].tobytes()) for band in range(bands)]
+
+        original = None
+        checked = set()
+        for key in keys:
+            for candidate in buckets.get(key, ()):
+                if candidate in checked:
+                    continue
+                checked.add(candidate)
+                if np.mean(signatures[candidate] == signature) >= threshold:
+                    original = candidate
+                    break
+            if original is not None:
+                break
+
+        if original is not None:
+            duplicates[index] = original
+            continue
+        signatures[index] = signature
+        for key in keys:
+            buckets.setdefault(key, []).append(index)
+    return duplicates
+
+
+def mark_duplicates(pages):
+    """Set page["duplicate_of"] (the original's page number) on near-duplicate pages; returns their count"""
+    duplicates = find_duplicates([page["text"] for page in pages])
+    for index, original in duplicates.items():
+        pages[index]["duplicate_of"] = pages[original]["metadata"]["page_num"]
+    if duplicates:
+        logger.info("Duplicates: %d of %d pages are near-duplicates of an earlier page", len(duplicates), len(pages))
+    return len(duplicates)
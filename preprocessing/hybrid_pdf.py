@@ -0,0 +1,80 @@
+import time
+import logging
+import fitz  # PyMuPDF
+from config import OCR_WORKERS, OCR_CHUNK_SIZE, OCR_MODE, EMBEDDING_INPUT, DUPLICATE_DETECTION_ENABLED, COMPACT_PAGES
+from preprocessing.scanned_pdf import iter_ocr_pages
+from preprocessing.page_signature import page_blocks, build_signatures
+from preprocessing.duplicates import mark_duplicates
+from preprocessing.page_store import PageStore
+from instrumentation import NULL_TRACER
+
+logger = logging.getLogger(__name__)
+
+
+def extract_pages(pdf_path, workers=OCR_WORKERS, chunk_size=OCR_CHUNK_SIZE, tracer=NULL_TRACER, mode=OCR_MODE):
+    """Extract all pages in one pass: text layer where present, OCR for the rest
+
+    Mixed PDFs (typed notes plus scanned forms) get text for every page, and
+    fully digital PDFs never touch the OCR pool. The text-layer pass is also the
+    scanned-page detection, so it is traced as one "extraction" stage.
+    pdf_path may also be the PDF's bytes (e.g. an upload held in memory).
+    With mode "bands", text-less pages are LazyPages (see preprocessing.lazy_ocr).
+    With EMBEDDING_INPUT "signature", text-layer pages also get a "signature".
+    Near-duplicate pages get "duplicate_of" (see preprocessing.duplicates);
+    in "bands" mode only pages with full text are compared.
+    With COMPACT_PAGES (and mode "full") the pages are returned as a PageStore.
+    """
+    pages = PageStore() if COMPACT_PAGES and mode != "bands" else []
+    needs_ocr = []
+    signatures = EMBEDDING_INPUT == "signature"
+    pages_blocks = []
+    in_memory = isinstance(pdf_path, (bytes, bytearray))
+    with tracer.stage("extraction") as stage, \
+            (fitz.open(stream=pdf_path, filetype="pdf") if in_memory else fitz.open(pdf_path)) as doc:
+        for page in doc:
+            if tracer.enabled:
+                start = time.perf_counter()
+                text = page.get_text()
+                tracer.page("extraction", page.number + 1, time.perf_counter() - start)
+            else:
+                text = page.get_text()
+            if not text.strip():  # No selectable text
+                needs_ocr.append(page.number + 1)
+            if signatures:
+                pages_blocks.append(page_blocks(page) if text.strip() else [])
+            pages.append({
+                "text": text,
+                "metadata": {"page_num": page.number + 1}
+            })
+        if signatures:
+            for page, signature in zip(pages, build_signatures(pages_blocks)):
+                if signature:
+                    page["signature"] = signature
+        stage["pages"] = len(pages)
+        stage["ocr_pages"] = len(needs_ocr)
+
+    if needs_ocr:
+        start = time.perf_counter()
+        if mode == "bands":
+            from preprocessing.lazy_ocr import iter_lazy_pages
+            with tracer.stage("ocr_bands", pages=len(needs_ocr)):
+                for page in iter_lazy_pages(pdf_path, needs_ocr, workers, chunk_size, tracer):
+                    pages[page["metadata"]["page_num"] - 1] = page
+        else:
+            with tracer.stage("ocr", pages=len(needs_ocr)):
+                for page_num, text in iter_ocr_pages(pdf_path, needs_ocr, workers, chunk_size, tracer):
+                    pages[page_num - 1]["text"] = text
+        elapsed = time.perf_counter() - start
+        logger.info(
+            "OCR: %d of %d pages without a text layer in %.1fs (%.2f pages/sec)",
+            len(needs_ocr), len(pages), elapsed, len(needs_ocr) / elapsed if elapsed else 0.0
+        )
+
+    if DUPLICATE_DETECTION_ENABLED:
+        full_text = pages
+        if mode == "bands":
+            from preprocessing.lazy_ocr import LazyPage
+            full_text = [page for page in pages if not isinstance(page, LazyPage)]
+        with tracer.stage("duplicates", pages=len(full_text)) as stage:
+            stage["duplicates"] = mark_duplicates(full_text)
+    return pages
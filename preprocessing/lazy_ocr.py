@@ -0,0 +1,104 @@
+import time
+import logging
+from config import OCR_WORKERS, OCR_CHUNK_SIZE, OCR_HEADER_BAND, OCR_FOOTER_BAND
+from instrumentation import NULL_TRACER
+from extraction.entities import analyze_page
+from preprocessing.scanned_pdf import iter_ocr_pages
+
+logger = logging.getLogger(__name__)
+
+
+class LazyDocument:
+    """Pages of one PDF that still need full-page OCR
+
+    pending: pages whose text downstream code needs (no header in their bands).
+    band_only: pages read from their band text; OCRed in full only if their
+    own "text" is read.
+    """
+
+    def __init__(self, pdf_path, workers=OCR_WORKERS, chunk_size=OCR_CHUNK_SIZE, tracer=NULL_TRACER):
+        self.pdf_path = pdf_path
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.tracer = tracer
+        self.pending = {}
+        self.band_only = {}
+
+    def materialize(self, band_only=False):
+        """OCR every pending page (or every band-only page) in one pass on the OCR pool"""
+        group = "band_only" if band_only else "pending"
+        pending = getattr(self, group)
+        setattr(self, group, {})
+        if not pending:
+            return
+        start = time.perf_counter()
+        try:
+            with self.tracer.stage("ocr", pages=len(pending)):
+                for page_num, text in iter_ocr_pages(self.pdf_path, sorted(pending), self.workers,
+                                                     self.chunk_size, self.tracer):
+                    pending[page_num]["text"] = text
+        except BaseException:
+            getattr(self, group).update(
+                (page_num, page) for page_num, page in pending.items() if not dict.__contains__(page, "text")
+            )
+            raise
+        logger.info("Lazy OCR: %d full pages OCRed on first use in %.1fs", len(pending), time.perf_counter() - start)
+
+
+class LazyPage(dict):
+    """Page dict whose "text" is OCRed when first read
+
+    Holds "metadata" from the start, and "band_text" (OCR of the header and
+    footer bands) when the bands carry a header; entity extraction, header
+    checks and embedding use that instead of "text" (see
+    extraction.entities.page_text). Reading "text" (page["text"],
+    page.get("text") or "text" in page) OCRs the full page, together with
+    the other pages of its document in the same group, so code that only
+    knows page["text"] still sees the full page.
+    """
+
+    def __init__(self, page_num, document, band_text=None):
+        super().__init__(metadata={"page_num": page_num})
+        if band_text is not None:
+            self["band_text"] = band_text
+        self.document = document
+
+    def _materialize(self):
+        if not dict.__contains__(self, "text"):
+            self.document.materialize(band_only=dict.__contains__(self, "band_text"))
+
+    def __getitem__(self, key):
+        if key == "text":
+            self._materialize()
+        return dict.__getitem__(self, key)
+
+    def get(self, key, default=None):
+        if key == "text":
+            self._materialize()
+        return dict.get(self, key, default)
+
+    def __contains__(self, key):
+        if key == "text":
+            self._materialize()
+        return dict.__contains__(self, key)
+
+
+def iter_lazy_pages(pdf_path, page_numbers, workers=OCR_WORKERS, chunk_size=OCR_CHUNK_SIZE, tracer=NULL_TRACER,
+                    bands=(OCR_HEADER_BAND, OCR_FOOTER_BAND)):
+    """Yield LazyPages in page order after OCRing only each page's header and footer bands
+
+    The bands hold the header line, MRN/DOB and "Electronically signed by"
+    lines on most pages, so a page whose bands match a header pattern keeps
+    the band text as "band_text" and is not OCRed in full by the pipeline.
+    Pages without one (continuations, which are grouped by their body) get
+    full-page OCR, all in one pass, on the first read of "text".
+    """
+    document = LazyDocument(pdf_path, workers, chunk_size, tracer)
+    for page_num, band_text in iter_ocr_pages(pdf_path, page_numbers, workers, chunk_size, tracer, bands):
+        if analyze_page(band_text).found_headers:
+            page = document.band_only[page_num] = LazyPage(page_num, document, band_text)
+        else:
+            page = document.pending[page_num] = LazyPage(page_num, document)
+        yield page
+    logger.info("Lazy OCR: %d pages read from header/footer bands, %d deferred to full OCR",
+                len(document.band_only), len(document.pending))
@@ -0,0 +1,131 @@
+import os
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from config import OCR_CACHE_ENABLED, OCR_CACHE_PATH, OCR_CACHE_MAX_MB, OCR_LANG, OCR_CONFIG
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+_tesseract_version = None
+
+
+def tesseract_version():
+    """Installed Tesseract version string (queried once per process)"""
+    global _tesseract_version
+    if _tesseract_version is None:
+        import pytesseract
+        _tesseract_version = str(pytesseract.get_tesseract_version())
+    return _tesseract_version
+
+
+class OcrCache:
+    """SQLite store of OCR text keyed by page image fingerprint and Tesseract settings
+
+    The key hashes the rendered image's pixels together with the Tesseract
+    version, language and config, so identical pages in different PDFs share
+    an entry and an upgrade or config change never returns stale text. Every
+    OCR worker process opens its own connection. When the stored text exceeds
+    max_bytes, the least recently used entries are deleted. Lookups update
+    cumulative hit/miss counters kept in the database.
+    """
+
+    def __init__(self, path=OCR_CACHE_PATH, max_bytes=OCR_CACHE_MAX_MB * 1024 * 1024,
+                 lang=OCR_LANG, config=OCR_CONFIG, version=None):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.settings = f"{version or tesseract_version()}\0{lang}\0{config}".encode()
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        with self._db:
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS ocr (key TEXT PRIMARY KEY, text TEXT NOT NULL, "
+                "size INTEGER NOT NULL, last_used REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS ocr_last_used ON ocr (last_used)")
+            self._db.execute("CREATE TABLE IF NOT EXISTS stats (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+            self._db.execute("INSERT OR IGNORE INTO stats VALUES ('hits', 0), ('misses', 0)")
+        self._size = self._stored_bytes()
+
+    def _stored_bytes(self):
+        return self._db.execute("SELECT COALESCE(SUM(size), 0) FROM ocr").fetchone()[0]
+
+    def key(self, image):
+        """Fingerprint of a PIL image's pixels plus the Tesseract settings"""
+        digest = hashlib.blake2b(self.settings, digest_size=20)
+        digest.update(f"{image.mode}\0{image.size}\0".encode())
+        digest.update(image.tobytes())
+        return digest.hexdigest()
+
+    def get(self, key):
+        """Cached text for key, or None"""
+        row = self._db.execute("SELECT text FROM ocr WHERE key = ?", (key,)).fetchone()
+        with self._db:
+            if row is None:
+                self.misses += 1
+                self._db.execute("UPDATE stats SET value = value + 1 WHERE name = 'misses'")
+                return None
+            self.hits += 1
+            self._db.execute("UPDATE ocr SET last_used = ? WHERE key = ?", (time.time(), key))
+            self._db.execute("UPDATE stats SET value = value + 1 WHERE name = 'hits'")
+        return row[0]
+
+    def put(self, key, text):
+        size = len(text.encode('utf-8', 'surrogatepass'))
+        with self._db:
+            self._db.execute("INSERT OR REPLACE INTO ocr VALUES (?, ?, ?, ?)", (key, text, size, time.time()))
+        self._size += size
+        if self._size > self.max_bytes:
+            self._evict()
+
+    def _evict(self):
+        """Delete least recently used entries until the store is under 90% of max_bytes"""
+        # Other processes write too, so start from the real total
+        self._size = self._stored_bytes()
+        excess = self._size - int(self.max_bytes * 0.9)
+        if excess <= 0:
+            return
+        keys = []
+        for key, size in self._db.execute("SELECT key, size FROM ocr ORDER BY last_used").fetchall():
+            keys.append((key,))
+            excess -= size
+            self._size -= size
+            if excess <= 0:
+                break
+        with self._db:
+            self._db.executemany("DELETE FROM ocr WHERE key = ?", keys)
+        logger.info("OCR cache: evicted %d entries", len(keys))
+
+    def stats(self):
+        """Entry count, stored bytes and cumulative hit rate across all processes"""
+        counters = dict(self._db.execute("SELECT name, value FROM stats"))
+        entries, size = self._db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM ocr").fetchone()
+        lookups = counters["hits"] + counters["misses"]
+        return {
+            "entries": entries,
+            "bytes": size,
+            "hits": counters["hits"],
+            "misses": counters["misses"],
+            "hit_rate": counters["hits"] / lookups if lookups else 0.0,
+        }
+
+    def close(self):
+        self._db.close()
+
+
+def get_ocr_cache():
+    """This thread's OCR cache, or None if disabled"""
+    if not OCR_CACHE_ENABLED:
+        return None
+    # SQLite connections must not cross a fork or a thread (in-process OCR runs on
+    # server and Streamlit threads), so each process and thread opens its own
+    cache = getattr(_local, "cache", None)
+    if cache is None or _local.pid != os.getpid():
+        cache = _local.cache = OcrCache()
+        _local.pid = os.getpid()
+    return cache
@@ -0,0 +1,62 @@
+import re
+from collections import Counter
+from config import SIGNATURE_TOP_BLOCKS, SIGNATURE_REPEAT_FRACTION
+from extraction.headers import get_header_matcher
+
+_DIGITS = re.compile(r'\d+')
+_SPACES = re.compile(r'\s+')
+_WORD = re.compile(r'[A-Za-z]{2,}')
+
+
+def page_blocks(page):
+    """Text blocks of a PyMuPDF page in reading order, each a list of non-empty lines"""
+    blocks = []
+    for x0, y0, x1, y1, text, block_no, block_type in page.get_text("blocks", sort=True):
+        if block_type != 0:  # image block
+            continue
+        lines = [line.strip() for line in text.splitlines() if line.strip()]
+        if lines:
+            blocks.append(lines)
+    return blocks
+
+
+def _line_key(line):
+    """Line with digits and spacing normalised, so "Page 3 of 40" repeats across pages"""
+    return _SPACES.sub(' ', _DIGITS.sub('#', line)).strip().lower()
+
+
+def repeated_lines(pages_blocks, min_fraction=SIGNATURE_REPEAT_FRACTION):
+    """Normalised lines that occur on at least min_fraction of the pages (banners, footers)"""
+    counts = Counter()
+    for blocks in pages_blocks:
+        counts.update({_line_key(line) for lines in blocks for line in lines})
+    threshold = max(2, min_fraction * len(pages_blocks))
+    return {key for key, count in counts.items() if count >= threshold}
+
+
+def page_signature(blocks, boilerplate, top_blocks=SIGNATURE_TOP_BLOCKS, matcher=None):
+    """Short embedding input for one page: its top blocks plus every header line
+
+    Lines in boilerplate are dropped first, so the repeated facility banner
+    and footers do not make every page look alike, and so are lines without
+    a word (lab values, reference ranges).
+    """
+    matcher = matcher or get_header_matcher()
+    kept = []
+    header_lines = []
+    for lines in blocks:
+        lines = [line for line in lines if _WORD.search(line) and _line_key(line) not in boilerplate]
+        if not lines:
+            continue
+        if len(kept) < top_blocks:
+            kept.append('\n'.join(lines))
+        else:
+            header_lines.extend(line for line in lines if matcher.find_headers(line))
+    return '\n'.join(kept + header_lines)
+
+
+def build_signatures(pages_blocks, top_blocks=SIGNATURE_TOP_BLOCKS, min_fraction=SIGNATURE_REPEAT_FRACTION):
+    """Signature text for each page of a document, from page_blocks() of every page"""
+    boilerplate = repeated_lines(pages_blocks, min_fraction)
+    matcher = get_header_matcher()
+    return [page_signature(blocks, boilerplate, top_blocks, matcher) for blocks in pages_blocks]
@@ -0,0 +1,123 @@
+from array import array
+
+
+class PageView:
+    """Dict-like view of one page in a PageStore
+
+    Supports the page-dict access used through the pipeline: page["text"],
+    page["metadata"]["page_num"], page.get(...), "key" in page and item
+    assignment. Views are created on access, so compare pages by page
+    number rather than identity across separate lookups.
+    """
+    __slots__ = ("store", "index")
+
+    def __init__(self, store, index):
+        self.store = store
+        self.index = index
+
+    def __getitem__(self, key):
+        return self.store.field(self.index, key)
+
+    def __setitem__(self, key, value):
+        self.store.set_field(self.index, key, value)
+
+    def __contains__(self, key):
+        try:
+            self.store.field(self.index, key)
+        except KeyError:
+            return False
+        return True
+
+    def get(self, key, default=None):
+        try:
+            return self.store.field(self.index, key)
+        except KeyError:
+            return default
+
+    def keys(self):
+        return [key for key in ("text", "metadata", "duplicate_of") if key in self] + \
+            list(self.store.extras.get(self.index, ()))
+
+    def __repr__(self):
+        return f"PageView(page_num={self.store.page_nums[self.index]})"
+
+
+class PageStore:
+    """Compact list of pages: one UTF-8 text buffer with offsets and a page_num array
+
+    A drop-in for the list of {"text", "metadata": {"page_num"}} dicts that
+    extraction returns, without a dict, nested dict and str object per page.
+    append() takes such a page dict; indexing and iteration yield PageViews.
+    Replacing a page's text appends the new text to the buffer. Keys other
+    than text, metadata and duplicate_of (e.g. "signature") are kept in a
+    per-page dict.
+    """
+
+    def __init__(self, pages=()):
+        self.buffer = bytearray()
+        self.starts = array('q')
+        self.ends = array('q')
+        self.page_nums = array('i')
+        self.duplicate_of = array('i')  # 0 when the page is not a duplicate
+        self.extras = {}
+        for page in pages:
+            self.append(page)
+
+    def append(self, page):
+        index = len(self.page_nums)
+        self.page_nums.append(page["metadata"]["page_num"])
+        self.starts.append(0)
+        self.ends.append(0)
+        self.duplicate_of.append(0)
+        for key, value in page.items():
+            if key != "metadata":
+                self.set_field(index, key, value)
+
+    def text(self, index):
+        return str(memoryview(self.buffer)[self.starts[index]:self.ends[index]], 'utf-8', 'surrogatepass')
+
+    def set_text(self, index, text):
+        self.starts[index] = len(self.buffer)
+        self.buffer += text.encode('utf-8', 'surrogatepass')
+        self.ends[index] = len(self.buffer)
+
+    def field(self, index, key):
+        if key == "text":
+            return self.text(index)
+        if key == "metadata":
+            return {"page_num": self.page_nums[index]}
+        if key == "duplicate_of":
+            if not self.duplicate_of[index]:
+                raise KeyError(key)
+            return self.duplicate_of[index]
+        return self.extras.get(index, {})[key]
+
+    def set_field(self, index, key, value):
+        if key == "text":
+            self.set_text(index, value)
+        elif key == "metadata":
+            raise TypeError("PageStore metadata is read-only")
+        elif key == "duplicate_of":
+            self.duplicate_of[index] = value
+        else:
+            self.extras.setdefault(index, {})[key] = value
+
+    def nbytes(self):
+        """Bytes held by the buffer and arrays (extras not included)"""
+        return len(self.buffer) + sum(a.itemsize * len(a) for a in (self.starts, self.ends, self.page_nums,
+                                                                       self.duplicate_of))
+
+    def __len__(self):
+        return len(self.page_nums)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [PageView(self, i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("page index out of range")
+        return PageView(self, index)
+
+    def __iter__(self):
+        return (PageView(self, index) for index in range(len(self)))
@@ -1,14 +1,257 @@
-from pdf2image import convert_from_path
-import pytesseract
-from datetime import datetime
+import io
+import os
+import time
+import shlex
+import logging
+import tempfile
+import subprocess
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from config import (
+    OCR_WORKERS, OCR_CHUNK_SIZE, OCR_LANG, OCR_CONFIG, OCR_CACHE_ENABLED,
+    OCR_RENDER_BACKEND, OCR_DPI, OCR_COLOR_MODE, OCR_BATCH_SIZE, OCR_MODE
+)
+from preprocessing.ocr_cache import get_ocr_cache
+from instrumentation import NULL_TRACER
 
-def extract_scanned_pages(pdf_path):
-    images = convert_from_path(pdf_path)
+logger = logging.getLogger(__name__)
+
+
+def page_ranges(page_numbers, chunk_size):
+    """Split sorted page numbers into contiguous (first, last) runs of at most chunk_size pages"""
+    ranges = []
+    first = last = None
+    for page_num in page_numbers:
+        if first is not None and page_num == last + 1 and page_num - first < chunk_size:
+            last = page_num
+            continue
+        if first is not None:
+            ranges.append((first, last))
+        first = last = page_num
+    if first is not None:
+        ranges.append((first, last))
+    return ranges
+
+
+def render_page_range(pdf_path, first_page, last_page, backend=OCR_RENDER_BACKEND, dpi=OCR_DPI,
+                      color_mode=OCR_COLOR_MODE):
+    """PIL images of pages first_page..last_page (1-based, inclusive); pdf_path may be bytes
+
+    "pymupdf" rasterises straight into memory; "poppler" goes through
+    pdf2image, which shells out to pdftoppm and reads back temporary files.
+    """
+    from PIL import Image
+    gray = color_mode in ("gray", "binary")
+    if backend == "pymupdf":
+        import fitz  # PyMuPDF
+        colorspace = fitz.csGRAY if gray else fitz.csRGB
+        images = []
+        with (fitz.open(stream=pdf_path, filetype="pdf") if isinstance(pdf_path, (bytes, bytearray))
+              else fitz.open(pdf_path)) as doc:
+            for page_index in range(first_page - 1, last_page):
+                pixmap = doc[page_index].get_pixmap(dpi=dpi, colorspace=colorspace, alpha=False)
+                images.append(Image.frombytes("L" if gray else "RGB", (pixmap.width, pixmap.height), pixmap.samples))
+    elif backend == "poppler":
+        from pdf2image import convert_from_path, convert_from_bytes
+        convert = convert_from_bytes if isinstance(pdf_path, (bytes, bytearray)) else convert_from_path
+        images = convert(pdf_path, dpi=dpi, first_page=first_page, last_page=last_page, grayscale=gray)
+    else:
+        raise ValueError(f"Unknown OCR render backend {backend!r}")
+
+    if color_mode == "binary":
+        # Fixed threshold at mid-gray, no dithering
+        images = [image.convert("1", dither=Image.NONE) for image in images]
+    return images
+
+
+def run_tesseract(image_arg, stdin=None):
+    """Run tesseract on image_arg ("stdin", an image path or an image list file) and return stdout"""
+    import pytesseract
+    command = [pytesseract.pytesseract.tesseract_cmd, image_arg, "stdout", "-l", OCR_LANG] + shlex.split(OCR_CONFIG)
+    result = subprocess.run(command, input=stdin, capture_output=True)
+    if result.returncode != 0:
+        raise pytesseract.TesseractError(result.returncode, result.stderr.decode("utf-8", "replace"))
+    return result.stdout.decode("utf-8")
+
+
+def image_to_text(image, dpi=OCR_DPI):
+    """OCR one PIL image, piping it to tesseract as PNG on stdin (no temporary files)"""
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG", dpi=(dpi, dpi))
+    return run_tesseract("stdin", buffer.getvalue())
+
+
+def images_to_text(images, dpi=OCR_DPI):
+    """OCR several PIL images with one tesseract process, via an image list file
+
+    Tesseract ends every page with a form feed, so the combined output is
+    split on "\f" and each page keeps its trailing "\f", exactly as a
+    single-page run returns it. If the page count does not line up, the
+    images are OCRed one by one instead.
+    """
+    if len(images) == 1:
+        return [image_to_text(images[0], dpi)]
+    with tempfile.TemporaryDirectory(prefix="ocr-batch-") as tmp_dir:
+        paths = []
+        for index, image in enumerate(images):
+            path = os.path.join(tmp_dir, f"page-{index:05d}.png")
+            image.save(path, format="PNG", dpi=(dpi, dpi))
+            paths.append(path)
+        list_path = os.path.join(tmp_dir, "images.txt")
+        with open(list_path, 'w') as f:
+            f.write("\n".join(paths) + "\n")
+        output = run_tesseract(list_path)
+
+    texts = output.split("\f")
+    if len(texts) != len(images) + 1 or texts[-1].strip():
+        logger.warning("Batched OCR returned %d pages for %d images; OCRing them one by one", len(texts) - 1, len(images))
+        return [image_to_text(image, dpi) for image in images]
+    return [text + "\f" for text in texts[:-1]]
+
+
+def crop_bands(image, bands):
+    """Top and bottom bands of a page image, stacked into one image
+
+    bands is (header fraction, footer fraction) of the page height.
+    """
+    from PIL import Image
+    header, footer = bands
+    width, height = image.size
+    top = image.crop((0, 0, width, int(height * header)))
+    bottom = image.crop((0, height - int(height * footer), width, height))
+    stacked = Image.new(image.mode, (width, top.height + bottom.height), "white")
+    stacked.paste(top, (0, 0))
+    stacked.paste(bottom, (0, top.height))
+    return stacked
+
+
+def ocr_page_range(pdf_path, first_page, last_page, batch_size=OCR_BATCH_SIZE, bands=None):
+    """Render and OCR one page range; only this range's images are held in memory
+
+    pdf_path may also be the PDF's bytes. With bands=(header, footer)
+    fractions only those strips of each page are OCRed. Pages not in the OCR
+    cache go to tesseract batch_size images per process. Returns (text,
+    seconds, cached) per page, where seconds is the page's share of the
+    range's render time plus its lookup/OCR time (a batch's time is split
+    evenly across its pages) and cached says the text came from the OCR cache.
+    """
+    cache = get_ocr_cache()
+    start = time.perf_counter()
+    images = render_page_range(pdf_path, first_page, last_page)
+    if bands:
+        pages, images = images, [crop_bands(image, bands) for image in images]
+        for image in pages:
+            image.close()
+    render_share = (time.perf_counter() - start) / max(len(images), 1)
+
+    texts = [None] * len(images)
+    seconds = [render_share] * len(images)
+    keys = [None] * len(images)
+    if cache is not None:
+        for index, image in enumerate(images):
+            start = time.perf_counter()
+            keys[index] = cache.key(image)
+            texts[index] = cache.get(keys[index])
+            seconds[index] += time.perf_counter() - start
+    cached = [text is not None for text in texts]
+
+    missing = [index for index, text in enumerate(texts) if text is None]
+    batch_size = max(1, batch_size)
+    for offset in range(0, len(missing), batch_size):
+        batch = missing[offset:offset + batch_size]
+        start = time.perf_counter()
+        for index, text in zip(batch, images_to_text([images[index] for index in batch])):
+            texts[index] = text
+            if cache is not None:
+                cache.put(keys[index], text)
+        batch_share = (time.perf_counter() - start) / len(batch)
+        for index in batch:
+            seconds[index] += batch_share
+
+    for image in images:
+        image.close()
+    return list(zip(texts, seconds, cached))
+
+
+def _init_ocr_worker():
+    # One Tesseract thread per process; the pool already uses every core
+    os.environ["OMP_THREAD_LIMIT"] = "1"
+
+
+def _page_results(first_page, results, tracer, stage, counts):
+    for page_num, (text, seconds, cached) in zip(range(first_page, first_page + len(results)), results):
+        tracer.page(stage, page_num, seconds)
+        counts[cached] += 1
+        yield page_num, text
+
+
+def iter_ocr_pages(pdf_path, page_numbers, workers=OCR_WORKERS, chunk_size=OCR_CHUNK_SIZE, tracer=NULL_TRACER,
+                   bands=None):
+    """Yield (page_num, text) in page order, OCRing chunks on a process pool
+
+    At most `workers` chunks are rendered at any time, so peak image memory is
+    roughly workers x chunk_size pages. Per-page latencies go to tracer. With
+    bands=(header, footer) only those strips of each page are OCRed.
+    """
+    ranges = page_ranges(sorted(page_numbers), chunk_size)
+    stage = "ocr_bands" if bands else "ocr"
+    counts = [0, 0]  # pages OCRed, pages from the OCR cache
+    spilled = None
+    if isinstance(pdf_path, (bytes, bytearray)) and len(ranges) > 1:
+        # One temp file for every chunk, instead of pickling the PDF to each
+        # worker task (and poppler writing its own temp file per chunk)
+        with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as f:
+            f.write(pdf_path)
+        pdf_path = spilled = f.name
+    try:
+        if workers <= 1 or len(ranges) <= 1:
+            for first_page, last_page in ranges:
+                results = ocr_page_range(pdf_path, first_page, last_page, OCR_BATCH_SIZE, bands)
+                yield from _page_results(first_page, results, tracer, stage, counts)
+        else:
+            # Spawned (not forked) workers: server and app threads call this after loading the torch model
+            context = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(max_workers=min(workers, len(ranges)), mp_context=context,
+                                     initializer=_init_ocr_worker) as executor:
+                results = executor.map(
+                    ocr_page_range,
+                    [pdf_path] * len(ranges),
+                    [first for first, _ in ranges],
+                    [last for _, last in ranges],
+                    [OCR_BATCH_SIZE] * len(ranges),
+                    [bands] * len(ranges)
+                )
+                for (first_page, _), page_results in zip(ranges, results):
+                    yield from _page_results(first_page, page_results, tracer, stage, counts)
+    finally:
+        if spilled is not None:
+            os.remove(spilled)
+    if OCR_CACHE_ENABLED:
+        logger.info("OCR cache: %d of %d pages reused", counts[1], sum(counts))
+
+
+def extract_scanned_pages(pdf_path, workers=OCR_WORKERS, chunk_size=OCR_CHUNK_SIZE, tracer=NULL_TRACER,
+                          mode=OCR_MODE):
+    """OCR every page; mode "bands" OCRs header/footer bands first (see preprocessing.lazy_ocr)"""
+    import fitz  # PyMuPDF
+    with fitz.open(pdf_path) as doc:
+        page_count = doc.page_count
+    start = time.perf_counter()
     pages = []
-    for i, img in enumerate(images):
-        text = pytesseract.image_to_string(img)
-        pages.append({
-            "text": text,
-            "metadata": {"page_num": i + 1}
-        })
-    return pages
\ No newline at end of file
+    if mode == "bands":
+        from preprocessing.lazy_ocr import iter_lazy_pages
+        with tracer.stage("ocr_bands", pages=page_count):
+            pages.extend(iter_lazy_pages(pdf_path, range(1, page_count + 1), workers, chunk_size, tracer))
+    else:
+        with tracer.stage("ocr", pages=page_count):
+            for page_num, text in iter_ocr_pages(pdf_path, range(1, page_count + 1), workers, chunk_size, tracer):
+                pages.append({
+                    "text": text,
+                    "metadata": {"page_num": page_num}
+                })
+    elapsed = time.perf_counter() - start
+    logger.info(
+        "OCR: %d pages in %.1fs (%.2f pages/sec, %d workers, chunk size %d)",
+        len(pages), elapsed, len(pages) / elapsed if elapsed else 0.0, workers, chunk_size
+    )
+    return pages
@@ -0,0 +1,335 @@
+"""Local HTTP job server for document processing
+
+Run from the repository root:
+
+    python server.py
+    python server.py --port 8765 --workers 2 --max-queued-pages 20000
+
+Endpoints (JSON unless noted):
+
+    POST   /jobs                  body: PDF bytes; ?segmentation=dbscan|sequential&name=...
+                                  202 {"job_id", "status", "pages"}; 503 when the page queue is full
+    GET    /jobs                  every known job's status
+    GET    /jobs/<id>             status, timings and error of one job
+    GET    /jobs/<id>/result      rows once done (409 with the status before); ?format=json|csv|jsonl|parquet
+    DELETE /jobs/<id>             forget a finished job
+    GET    /health                workers, queue depth and queued pages
+
+Jobs wait in an in-process queue drained by worker threads that share one
+warm embedding model. Extraction and OCR of different jobs run in parallel;
+embedding runs one job at a time so the model's threads are not
+oversubscribed. Everything stays on this machine.
+"""
+import io
+import json
+import time
+import uuid
+import queue
+import logging
+import argparse
+import threading
+from collections import OrderedDict
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+import fitz  # PyMuPDF
+from config import (
+    OCR_WORKERS, SEGMENTATION_METHOD, CSV_HEADER, SERVER_HOST, SERVER_PORT, SERVER_WORKERS,
+    SERVER_MAX_QUEUED_PAGES, SERVER_MAX_UPLOAD_MB, SERVER_MAX_FINISHED_JOBS
+)
+from preprocessing.hybrid_pdf import extract_pages
+from clustering.embeddings import get_embeddings, warm_up
+from instrumentation import Tracer
+from output_writers import open_writer
+from main import assign_labels, generate_output
+
+logger = logging.getLogger(__name__)
+
+SEGMENTATION_METHODS = ("dbscan", "sequential")
+CONTENT_TYPES = {
+    "csv": "text/csv",
+    "jsonl": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+class QueueFull(Exception):
+    """The job would push queued pages over the limit; retry later"""
+
+
+class Job:
+    def __init__(self, data, pages, name=None, method=SEGMENTATION_METHOD):
+        self.id = uuid.uuid4().hex
+        self.data = data
+        self.pages = pages
+        self.name = name
+        self.method = method
+        self.status = "queued"
+        self.error = None
+        self.rows = None
+        self.trace = None
+        self.submitted = time.time()
+        self.started = None
+        self.finished = None
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "name": self.name,
+            "status": self.status,
+            "pages": self.pages,
+            "segmentation": self.method,
+            "submitted": self.submitted,
+            "started": self.started,
+            "finished": self.finished,
+            "error": self.error,
+            "rows": len(self.rows) if self.rows is not None else None,
+            "stages": self.trace["stages"] if self.trace else None,
+        }
+
+
+class JobQueue:
+    """In-process job queue with a fixed pool of worker threads and a queued-pages limit"""
+
+    def __init__(self, workers=SERVER_WORKERS, max_queued_pages=SERVER_MAX_QUEUED_PAGES,
+                 max_finished_jobs=SERVER_MAX_FINISHED_JOBS, ocr_workers=None):
+        self.workers = max(1, workers)
+        self.max_queued_pages = max_queued_pages
+        self.max_finished_jobs = max_finished_jobs
+        # Split the OCR processes between concurrently running jobs
+        self.ocr_workers = ocr_workers or max(1, OCR_WORKERS // self.workers)
+        self.jobs = OrderedDict()
+        self.queued_pages = 0
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._embedding_lock = threading.Lock()
+        self._threads = []
+
+    def start(self):
+        warm_up()
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def submit(self, data, name=None, method=SEGMENTATION_METHOD):
+        """Queue a PDF (bytes); raises ValueError for unreadable PDFs and QueueFull under back-pressure"""
+        try:
+            with fitz.open(stream=data, filetype="pdf") as doc:
+                pages = doc.page_count
+        except Exception as e:
+            raise ValueError(f"Not a readable PDF: {e}")
+        if pages > self.max_queued_pages:
+            raise ValueError(f"Document has {pages} pages; the server accepts at most {self.max_queued_pages}")
+
+        job = Job(data, pages, name, method)
+        with self._lock:
+            if self.queued_pages + pages > self.max_queued_pages:
+                raise QueueFull(f"{self.queued_pages} pages already queued (limit {self.max_queued_pages})")
+            self.queued_pages += pages
+            self.jobs[job.id] = job
+        self._queue.put(job)
+        logger.info("Job %s queued: %s, %d pages", job.id, name or "unnamed", pages)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self.jobs.get(job_id)
+
+    def list(self):
+        with self._lock:
+            return list(self.jobs.values())
+
+    def delete(self, job_id):
+        """Forget a finished job; returns False if unknown or still queued/running"""
+        with self._lock:
+            job = self.jobs.get(job_id)
+            if job is None or job.status in ("queued", "running"):
+                return False
+            del self.jobs[job_id]
+            return True
+
+    def stats(self):
+        with self._lock:
+            statuses = [job.status for job in self.jobs.values()]
+            return {
+                "workers": self.workers,
+                "queued_pages": self.queued_pages,
+                "max_queued_pages": self.max_queued_pages,
+                "jobs": {status: statuses.count(status) for status in ("queued", "running", "done", "failed")},
+            }
+
+    def _work(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            job.status = "running"
+            job.started = time.time()
+            try:
+                job.rows, job.trace = self._process(job)
+                job.status = "done"
+            except Exception as e:
+                job.status = "failed"
+                job.error = f"{type(e).__name__}: {e}"
+                logger.exception("Job %s failed", job.id)
+            finally:
+                job.finished = time.time()
+                job.data = None
+                with self._lock:
+                    self.queued_pages -= job.pages
+                    self._prune()
+            logger.info("Job %s %s in %.1fs", job.id, job.status, job.finished - job.started)
+
+    def _process(self, job):
+        tracer = Tracer(job.name)
+        pages = extract_pages(job.data, workers=self.ocr_workers, tracer=tracer)
+        job.data = None
+        with self._embedding_lock, tracer.stage("embedding", pages=len(pages)):
+            embeddings = get_embeddings(pages)
+        labels = assign_labels(pages, embeddings, job.method, tracer)
+        with tracer.stage("output", pages=len(pages)):
+            rows = generate_output(pages, labels, output_path=None)
+        return rows, tracer.to_dict()
+
+    def _prune(self):
+        finished = [job_id for job_id, job in self.jobs.items() if job.status in ("done", "failed")]
+        for job_id in finished[:max(0, len(finished) - self.max_finished_jobs)]:
+            del self.jobs[job_id]
+
+
+def render_rows(rows, output_format):
+    """Rows as bytes in csv, jsonl or parquet via the output writers"""
+    buffer = io.BytesIO() if output_format == "parquet" else io.StringIO()
+    writer = open_writer(buffer, output_format)
+    writer.write_rows(rows)
+    writer.close()
+    value = buffer.getvalue()
+    return value if isinstance(value, bytes) else value.encode("utf-8")
+
+
+class JobRequestHandler(BaseHTTPRequestHandler):
+    server_version = "DocumentJobServer/1.0"
+
+    @property
+    def jobs(self):
+        return self.server.job_queue
+
+    def log_message(self, format, *args):
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+    def _send(self, status, body, content_type="application/json", headers=None):
+        if content_type == "application/json":
+            body = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _error(self, status, message, headers=None):
+        self._send(status, {"error": message}, headers=headers)
+
+    def _route(self):
+        url = urlparse(self.path)
+        parts = [part for part in url.path.split("/") if part]
+        return parts, {name: values[-1] for name, values in parse_qs(url.query).items()}
+
+    def do_POST(self):
+        parts, params = self._route()
+        if parts != ["jobs"]:
+            return self._error(404, "Not found")
+        length = int(self.headers.get("Content-Length") or 0)
+        if length <= 0:
+            return self._error(400, "Request body must be the PDF bytes")
+        if length > SERVER_MAX_UPLOAD_MB * 1024 * 1024:
+            return self._error(413, f"Upload larger than {SERVER_MAX_UPLOAD_MB} MB")
+        method = params.get("segmentation", SEGMENTATION_METHOD)
+        if method not in SEGMENTATION_METHODS:
+            return self._error(400, f"segmentation must be one of {', '.join(SEGMENTATION_METHODS)}")
+        data = self.rfile.read(length)
+        try:
+            job = self.jobs.submit(data, params.get("name"), method)
+        except QueueFull as e:
+            return self._error(503, str(e), headers={"Retry-After": "30"})
+        except ValueError as e:
+            return self._error(400, str(e))
+        self._send(202, {"job_id": job.id, "status": job.status, "pages": job.pages},
+                   headers={"Location": f"/jobs/{job.id}"})
+
+    def do_GET(self):
+        parts, params = self._route()
+        if parts == ["health"]:
+            return self._send(200, self.jobs.stats())
+        if parts == ["jobs"]:
+            return self._send(200, [job.to_dict() for job in self.jobs.list()])
+        if len(parts) not in (2, 3) or parts[0] != "jobs" or (len(parts) == 3 and parts[2] != "result"):
+            return self._error(404, "Not found")
+        job = self.jobs.get(parts[1])
+        if job is None:
+            return self._error(404, "Unknown job")
+        if len(parts) == 2:
+            return self._send(200, job.to_dict())
+
+        if job.status != "done":
+            return self._send(409, job.to_dict())
+        output_format = params.get("format", "json")
+        if output_format == "json":
+            return self._send(200, {"columns": CSV_HEADER, "rows": job.rows})
+        if output_format not in CONTENT_TYPES:
+            return self._error(400, f"format must be json or one of {', '.join(CONTENT_TYPES)}")
+        self._send(200, render_rows(job.rows, output_format), CONTENT_TYPES[output_format])
+
+    def do_DELETE(self):
+        parts, _ = self._route()
+        if len(parts) != 2 or parts[0] != "jobs":
+            return self._error(404, "Not found")
+        if self.jobs.get(parts[1]) is None:
+            return self._error(404, "Unknown job")
+        if not self.jobs.delete(parts[1]):
+            return self._error(409, "Job is still queued or running")
+        self._send(200, {"job_id": parts[1], "deleted": True})
+
+
+def make_server(job_queue, host=SERVER_HOST, port=SERVER_PORT):
+    server = ThreadingHTTPServer((host, port), JobRequestHandler)
+    server.daemon_threads = True
+    server.job_queue = job_queue
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default=SERVER_HOST)
+    parser.add_argument("--port", type=int, default=SERVER_PORT)
+    parser.add_argument("--workers", type=int, default=SERVER_WORKERS, help="Jobs processed concurrently")
+    parser.add_argument("--ocr-workers", type=int, default=None,
+                        help="OCR processes per job (default: OCR_WORKERS split across workers)")
+    parser.add_argument("--max-queued-pages", type=int, default=SERVER_MAX_QUEUED_PAGES)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    job_queue = JobQueue(args.workers, args.max_queued_pages, ocr_workers=args.ocr_workers)
+    job_queue.start()
+    server = make_server(job_queue, args.host, args.port)
+    logger.info("Serving on http://%s:%d (%d workers)", args.host, args.port, job_queue.workers)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        job_queue.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""Sweep DBSCAN eps / min_samples and the postprocessing gap on a labelled document set
+
+Run from the repository root:
+
+    python sweep.py labelled/
+    python sweep.py a.pdf b.pdf --eps 0.3 0.4 0.5 0.6 --min-samples 1 2 3 --gap 1 3 5 --workers 8
+
+Every PDF needs its ground truth next to it as <name>.csv, with at least the
+"pagenumber" and "category" columns of the output CSV (e.g. a reviewed
+output file). Documents are extracted and embedded once, and each gets one
+sparse cosine-distance graph at the largest eps; every grid point then runs
+DBSCAN on that graph, postprocess_clusters and generate_output on a process
+pool. A true (page, category) row counts as correct when the predicted rows
+of that page carry the category, mapped from the header the same way
+accuracy.py does. Grid points are printed best first with their clustering
+seconds (DBSCAN plus postprocessing, summed over the documents).
+"""
+import os
+import csv
+import json
+import time
+import logging
+import argparse
+import itertools
+import multiprocessing
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from config import DBSCAN_EPS, MIN_SAMPLES, POSTPROCESS_MAX_GAP, CSV_HEADER
+from accuracy import map_header_to_category
+from batch import find_pdfs
+
+logger = logging.getLogger(__name__)
+
+HEADER_COLUMN = CSV_HEADER.index("header")
+
+_documents = None
+
+
+def truth_path_for(pdf_path):
+    return os.path.splitext(pdf_path)[0] + ".csv"
+
+
+def load_truth(csv_path):
+    """Counter of (page number, category) rows of a labelled CSV"""
+    with open(csv_path, 'r', newline='') as f:
+        return Counter((int(row["pagenumber"]), int(row["category"])) for row in csv.DictReader(f))
+
+
+def row_category(header):
+    """Category of an output header such as "Name - Clinical Notes - MRN: 1", as accuracy.py maps it"""
+    for part in header.split(" - "):
+        category = map_header_to_category(part)
+        if category != -1:
+            return category
+    return -1
+
+
+def prepare_documents(pdf_paths, max_eps):
+    """Extract, embed and build the distance graph of every labelled PDF once"""
+    from preprocessing.hybrid_pdf import extract_pages
+    from clustering.embeddings import get_embeddings
+    from clustering.clustering import radius_neighbors_graph
+    from extraction.entities import page_text
+
+    documents = []
+    for pdf_path in pdf_paths:
+        start = time.perf_counter()
+        # Plain dicts pickle cheaply to the workers; LazyPages are OCRed in full only where page_text needs it
+        pages = [dict(page, text=page_text(page)) for page in extract_pages(pdf_path)]
+        extracted = time.perf_counter()
+        embeddings = get_embeddings(pages)
+        embedded = time.perf_counter()
+        graph = radius_neighbors_graph(embeddings, eps=max_eps)
+        logger.info(
+            "%s: %d pages, extract %.1fs, embed %.1fs, graph %.2fs", pdf_path, len(pages),
+            extracted - start, embedded - extracted, time.perf_counter() - embedded
+        )
+        documents.append({
+            "file": pdf_path,
+            "pages": pages,
+            "graph": graph,
+            "truth": load_truth(truth_path_for(pdf_path)),
+        })
+    return documents
+
+
+def _init_worker(documents):
+    global _documents
+    _documents = documents
+
+
+def evaluate_point(eps, min_samples, max_gap):
+    """Score one grid point on every document (runs in a pool worker)"""
+    from sklearn.cluster import DBSCAN
+    from main import postprocess_clusters, generate_output
+
+    seconds = 0.0
+    correct = 0
+    total = 0
+    segments = 0
+    for document in _documents:
+        pages = document["pages"]
+        start = time.perf_counter()
+        labels = DBSCAN(eps=eps, min_samples=min_samples, metric='precomputed').fit_predict(document["graph"])
+        labels = postprocess_clusters(pages, labels, max_gap=max_gap)
+        seconds += time.perf_counter() - start
+        segments += len(set(labels))
+
+        predicted = defaultdict(Counter)
+        for row in generate_output(pages, labels, output_path=None):
+            predicted[row[0]][row_category(row[HEADER_COLUMN])] += 1
+        for (page_num, category), count in document["truth"].items():
+            correct += min(count, predicted[page_num][category])
+            total += count
+    return {
+        "eps": eps,
+        "min_samples": min_samples,
+        "max_gap": max_gap,
+        "accuracy": correct / total if total else 0.0,
+        "segments": segments,
+        "seconds": seconds,
+    }
+
+
+def run_sweep(documents, eps_values, min_samples_values, gaps, workers=1):
+    """Evaluate the full grid on a process pool; results sorted by accuracy, then speed"""
+    grid = list(itertools.product(eps_values, min_samples_values, gaps))
+    # Spawned (not forked) workers: the parent holds a loaded embedding model
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=max(1, min(workers, len(grid))), mp_context=context,
+                             initializer=_init_worker, initargs=(documents,)) as executor:
+        results = list(executor.map(evaluate_point, *zip(*grid)))
+    results.sort(key=lambda r: (-r["accuracy"], r["seconds"]))
+    return results
+
+
+def print_table(results):
+    print(f"{'eps':>6}{'min_samples':>13}{'gap':>5}{'accuracy':>10}{'segments':>10}{'seconds':>10}")
+    for r in results:
+        marker = "  (config)" if (r["eps"], r["min_samples"], r["max_gap"]) == (
+            DBSCAN_EPS, MIN_SAMPLES, POSTPROCESS_MAX_GAP) else ""
+        print(
+            f"{r['eps']:>6.3f}{r['min_samples']:>13}{r['max_gap']:>5}{r['accuracy']:>10.3f}"
+            f"{r['segments']:>10}{r['seconds']:>10.3f}{marker}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("inputs", nargs="+", help="Labelled PDF files and/or directories (each PDF with <name>.csv)")
+    parser.add_argument("--eps", type=float, nargs="+", default=[0.3, 0.4, 0.5, 0.6, 0.7])
+    parser.add_argument("--min-samples", type=int, nargs="+", default=[1, 2, 3, 4])
+    parser.add_argument("--gap", type=int, nargs="+", default=[0, 1, 3, 5, 10],
+                        help="postprocess_clusters max_gap values")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Grid points evaluated in parallel")
+    parser.add_argument("--output", help="Also write the results as JSON")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    pdf_paths = find_pdfs(args.inputs)
+    missing = [path for path in pdf_paths if not os.path.exists(truth_path_for(path))]
+    if not pdf_paths:
+        parser.error("no PDFs given")
+    if missing:
+        parser.error("no ground truth CSV for " + ", ".join(missing))
+
+    documents = prepare_documents(pdf_paths, max(args.eps))
+    start = time.perf_counter()
+    results = run_sweep(documents, args.eps, args.min_samples, args.gap, args.workers)
+    logger.info("%d grid points on %d documents in %.1fs", len(results), len(documents), time.perf_counter() - start)
+    print_table(results)
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)